@@ -1,29 +1,33 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from app.database import Database, get_database
 from app.schemas.cow import CowCreate, CowResponse
 from app.services.cow_service import CowService
 
 router = APIRouter()
-cow_service = CowService()
+
+def get_cow_service(db: Database = Depends(get_database)) -> CowService:
+    """FastAPI dependency that returns a cow service over the app's database"""
+    return CowService(db)
 
 @router.post("/{id}", response_model=CowResponse, status_code=201)
-async def create_cow(id: str, cow: CowCreate):
+async def create_cow(id: str, cow: CowCreate, service: CowService = Depends(get_cow_service)):
     """Create a new cow"""
     try:
-        return await cow_service.create_cow(id, cow)
+        return await service.create_cow(id, cow)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except FileExistsError as e:
         raise HTTPException(status_code=409, detail=str(e))
 
 @router.get("/{id}", response_model=CowResponse)
-async def get_cow(id: str):
+async def get_cow(id: str, service: CowService = Depends(get_cow_service)):
     """Get cow by ID"""
-    cow = await cow_service.get_cow(id)
+    cow = await service.get_cow(id)
     if not cow:
         raise HTTPException(status_code=404, detail=f"Cow with id {id} not found")
     return cow
 
 @router.get("/", response_model=list[CowResponse])
-async def list_cows():
+async def list_cows(service: CowService = Depends(get_cow_service)):
     """List all cows"""
-    return await cow_service.list_cows()
+    return await service.list_cows()
@@ -1,14 +1,40 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi_utils.tasks import repeat_every
 from app.schemas.measurement import MeasurementResponse
 from app.services.measurement_service import MeasurementService
+from app.services.measurement_buffer import MeasurementBuffer
+from app.core.config import settings
 from app.database import get_db
 import logging
 
 logger = logging.getLogger(__name__)
 db = get_db()
 router = APIRouter()
-measurement_service = MeasurementService()
+measurement_service = MeasurementService(db)
+measurement_buffer = MeasurementBuffer(
+    db,
+    max_batch_size=settings.MEASUREMENT_BATCH_SIZE,
+    flush_interval=settings.MEASUREMENT_FLUSH_INTERVAL
+)
+
+def get_measurement_service() -> MeasurementService:
+    """FastAPI dependency that returns the shared measurement service"""
+    return measurement_service
+
+def get_measurement_buffer() -> MeasurementBuffer:
+    """FastAPI dependency that returns the shared measurement write buffer"""
+    return measurement_buffer
+
+@router.on_event("startup")
+async def start_measurement_buffer():
+    """Start batching single measurement writes"""
+    measurement_buffer.start()
+
+@router.on_event("shutdown")
+async def stop_measurement_buffer():
+    """Write any buffered measurements before shutting down"""
+    await measurement_buffer.stop()
 
 @router.on_event("startup")
 @repeat_every(seconds=60)
@@ -17,18 +43,23 @@ async def save_measurements_periodically():
     try:
         measurements = await measurement_service.get_all_cows_measurements()
         if measurements:
-            db.save_measurements(measurements)
+            await run_in_threadpool(db.save_measurements, measurements)
             logger.info(f"Background task saved {len(measurements)} measurements")
     except Exception as e:
         logger.error(f"Error in background task: {str(e)}")
 
 @router.get("/{cow_id}", response_model=MeasurementResponse)
-async def get_next_measurement(cow_id: str):
+async def get_next_measurement(
+    cow_id: str,
+    service: MeasurementService = Depends(get_measurement_service),
+    buffer: MeasurementBuffer = Depends(get_measurement_buffer)
+):
     """Get next measurement for a cow"""
     try:
-        measurement = await measurement_service.get_next_measurement(cow_id)
+        measurement = await service.get_next_measurement(cow_id)
         if measurement:
-            db.save_measurements([measurement])
+            # Written with the next batch, so the response doesn't wait on the commit
+            await buffer.put(measurement)
         return measurement
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -1,8 +1,13 @@
-from fastapi import APIRouter, HTTPException
-from sqlmodel import select, func
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from sqlmodel import Session, select, func
 from datetime import date, datetime, timedelta
-from typing import List
-from app.database import get_db
+from typing import Iterator, List
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.database import get_session
+from app.models.cow import Cow
 from app.models.measurement import Measurement
 from app.models.reports import CowWeightReport, DailyMilkReport, MilkSummaryReport, MeasurementDetail
 import logging
@@ -10,63 +15,123 @@ import logging
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
+report_cache = TTLCache(maxsize=settings.REPORT_CACHE_MAXSIZE)
+
+# Validates all detail rows of a report in one call
+DETAIL_ADAPTER = TypeAdapter(list[MeasurementDetail])
+
+# Rows fetched per cursor round trip when streaming a report
+STREAM_CHUNK_SIZE = 500
+
+
+def _stream_daily_report(session: Session, query, report_date: date, total_liters: float, measurement_count: int) -> Iterator[bytes]:
+    """
+    Yield a DailyMilkReport as incremental JSON, serializing the measurements
+    chunk by chunk from a server-side cursor instead of building the full list.
+    """
+    empty_report = DailyMilkReport(
+        date=report_date,
+        total_liters=total_liters,
+        measurement_count=measurement_count,
+        measurements=[]
+    ).model_dump_json()
+    # Re-open the empty "measurements" array and stream its items into it
+    yield empty_report.removesuffix("]}").encode()
+    
+    separator = b""
+    result = session.exec(query.execution_options(yield_per=STREAM_CHUNK_SIZE))
+    for rows in result.partitions():
+        chunk = DETAIL_ADAPTER.dump_json(DETAIL_ADAPTER.validate_python(rows, from_attributes=True))
+        yield separator + chunk[1:-1]
+        separator = b","
+    
+    yield b"]}"
+
 
 @router.get("/milk/daily/{cow_id}/{report_date}", response_model=DailyMilkReport)
-async def get_daily_milk_report_by_date(cow_id: str, report_date: date):
+async def get_daily_milk_report_by_date(cow_id: str, report_date: date, session: Session = Depends(get_session)):
     """
     Get milk production report for a specific date.
     Returns total milk in liters and detailed measurements for that day.
     """
+    cache_key = ("milk_daily", cow_id, report_date)
+    cached = report_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
     try:
-        db = get_db()
-        
-        with db.get_session() as session:
-            # Get the start and end of the day
-            start_datetime = datetime.combine(report_date, datetime.min.time())
-            end_datetime = datetime.combine(report_date, datetime.max.time())
-            
-            # Query measurements for the specific date where unit is 'L'
-            query = (
-                select(Measurement)
-                .where(
-                    Measurement.unit == 'L',
-                    Measurement.cow_id == cow_id,
-                    Measurement.measured_at >= start_datetime,
-                    Measurement.measured_at <= end_datetime
-                )
-                .order_by(Measurement.measured_at.desc()) # type: ignore
+        # Get the start and end of the day
+        start_datetime = datetime.combine(report_date, datetime.min.time())
+        end_datetime = datetime.combine(report_date, datetime.max.time())
+        
+        # Filter for measurements on the specific date where unit is 'L'
+        day_filter = (
+            Measurement.unit == 'L',
+            Measurement.cow_id == cow_id,
+            Measurement.measured_at >= start_datetime,
+            Measurement.measured_at <= end_datetime
+        )
+        
+        # Calculate totals in the database
+        totals_query = (
+            select(
+                func.coalesce(func.sum(Measurement.value), 0).label('total_liters'),
+                func.count(Measurement.id).label('measurement_count') # type: ignore
             )
-            
-            measurements = session.exec(query).all()
-            
-            if not measurements:
-                raise HTTPException(
-                    status_code=404, 
-                    detail=f"No milk measurements found for {report_date}"
-                )
-            
-            # Calculate total
-            total_liters = sum(m.value for m in measurements)
-            
-            result = DailyMilkReport(
-                date=report_date,
-                total_liters=round(total_liters, 2),
-                measurement_count=len(measurements),
-                measurements=[
-                    MeasurementDetail(
-                        cow_id=m.cow_id,
-                        cow_name=m.name or "Unknown",
-                        value=m.value,
-                        measured_at=m.measured_at,
-                        sensor_id=m.sensor_id
-                    )
-                    for m in measurements
-                ]
+            .where(*day_filter)
+        )
+        
+        totals = session.exec(totals_query).one()
+        
+        if not totals.measurement_count:
+            raise HTTPException(
+                status_code=404, 
+                detail=f"No milk measurements found for {report_date}"
+            )
+        
+        # Only fetch the columns needed for the measurement details
+        query = (
+            select(
+                Measurement.cow_id,
+                func.coalesce(Cow.name, 'Unknown').label('cow_name'),
+                Measurement.value,
+                Measurement.measured_at,
+                Measurement.sensor_id
+            )
+            .outerjoin(Cow, Cow.id == Measurement.cow_id) # type: ignore
+            .where(*day_filter)
+            .order_by(Measurement.measured_at.desc()) # type: ignore
+        )
+        
+        if totals.measurement_count > settings.DAILY_REPORT_STREAM_THRESHOLD:
+            # The request session stays open until the response has been sent
+            logger.info(f"Streaming {totals.measurement_count} measurements for {report_date}")
+            total_liters = round(totals.total_liters, 2)
+            return StreamingResponse(
+                _stream_daily_report(session, query, report_date, total_liters, totals.measurement_count),
+                media_type="application/json",
+                headers={
+                    "X-Total-Liters": str(total_liters),
+                    "X-Measurement-Count": str(totals.measurement_count)
+                }
             )
-            
-            logger.info(f"Retrieved {len(measurements)} measurements for {report_date}")
-            return result
-            
+        
+        measurements = DETAIL_ADAPTER.validate_python(session.exec(query).all(), from_attributes=True)
+        
+        result = DailyMilkReport(
+            date=report_date,
+            total_liters=round(totals.total_liters, 2),
+            measurement_count=totals.measurement_count,
+            measurements=measurements
+        )
+        
+        # Past days are closed, so their reports can be kept much longer
+        ttl = settings.REPORT_CACHE_HISTORICAL_TTL if report_date < date.today() else settings.REPORT_CACHE_TTL
+        report_cache.set(cache_key, result, ttl)
+        
+        logger.info(f"Retrieved {len(measurements)} measurements for {report_date}")
+        return result
+    
     except HTTPException:
         raise
     except Exception as e:
@@ -75,129 +140,141 @@ async def get_daily_milk_report_by_date(cow_id: str, report_date: date):
 
 
 @router.get("/milk/summary/{cow_id}", response_model=MilkSummaryReport)
-async def get_milk_summary(cow_id: str):
+async def get_milk_summary(cow_id: str, session: Session = Depends(get_session)):
     """
     Get overall milk production summary.
     Returns total milk production and statistics.
     """
+    cache_key = ("milk_summary", cow_id)
+    cached = report_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
     try:
-        db = get_db()
-        
-        with db.get_session() as session:
-            # Get overall statistics
-            query = (
-                select(
-                    func.sum(Measurement.value).label('total_liters'),
-                    func.count(Measurement.id).label('total_measurements'), # type: ignore
-                    func.avg(Measurement.value).label('avg_per_measurement'),
-                    func.min(Measurement.measured_at).label('first_measurement'),
-                    func.max(Measurement.measured_at).label('last_measurement')
-                )
-                .where(
-                    Measurement.unit == 'L',
-                    Measurement.cow_id == cow_id
-                    )
+        # Get overall statistics, defaulting to 0 when there are no measurements
+        query = (
+            select(
+                func.coalesce(func.sum(Measurement.value), 0).label('total_liters'),
+                func.count(Measurement.id).label('total_measurements'), # type: ignore
+                func.coalesce(func.avg(Measurement.value), 0).label('avg_per_measurement'),
+                func.min(Measurement.measured_at).label('first_measurement'),
+                func.max(Measurement.measured_at).label('last_measurement')
             )
-            
-            result = session.exec(query).first()
-            
-            if not result or result[0] is None:
-                return MilkSummaryReport(
-                    total_liters=0,
-                    total_measurements=0,
-                    avg_per_measurement=0,
-                    first_measurement=None,
-                    last_measurement=None
+            .where(
+                Measurement.unit == 'L',
+                Measurement.cow_id == cow_id
                 )
-            
-            summary = MilkSummaryReport(
-                total_liters=round(float(result[0]), 2) if result[0] else 0,
-                total_measurements=int(result[1]) if result[1] else 0,
-                avg_per_measurement=round(float(result[2]), 2) if result[2] else 0,
-                first_measurement=result[3],
-                last_measurement=result[4]
-            )
-            
-            logger.info("Generated milk production summary")
-            return summary
-            
+        )
+        
+        result = session.exec(query).one()
+        
+        summary = MilkSummaryReport(
+            total_liters=round(result.total_liters, 2),
+            total_measurements=result.total_measurements,
+            avg_per_measurement=round(result.avg_per_measurement, 2),
+            first_measurement=result.first_measurement,
+            last_measurement=result.last_measurement
+        )
+        
+        report_cache.set(cache_key, summary, settings.REPORT_CACHE_TTL)
+        
+        logger.info("Generated milk production summary")
+        return summary
+    
     except Exception as e:
         logger.error(f"Error generating milk summary: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error generating summary: {str(e)}")
 
 
 @router.get("/weight/{cow_id}", response_model=CowWeightReport)
-async def get_cow_weight_report(cow_id: str):
+async def get_cow_weight_report(cow_id: str, session: Session = Depends(get_session)):
     """
     Get weight report for a specific cow.
     Returns the current weight (most recent) and 30-day average.
     """
+    cache_key = ("weight", cow_id)
+    cached = report_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
     try:
-        db = get_db()
-        
-        with db.get_session() as session:
-            # Get the most recent weight measurement
-            current_query = (
-                select(Measurement)
-                .where(
-                    Measurement.unit == 'kg',
-                    Measurement.cow_id == cow_id
-                )
-                .order_by(Measurement.measured_at.desc()) # type: ignore
-                .limit(1)
+        # Get the most recent weight measurement together with the
+        # 30-day aggregates in a single round trip. The window starts at midnight
+        # so the cutoff bind value stays the same for every request of the day
+        thirty_days_ago = datetime.combine(date.today() - timedelta(days=30), datetime.min.time())
+        
+        last_30_days = (
+            Measurement.unit == 'kg',
+            Measurement.cow_id == cow_id,
+            Measurement.measured_at >= thirty_days_ago
+        )
+        avg_weight_query = (
+            select(func.avg(Measurement.value))
+            .where(*last_30_days)
+            .correlate(None)
+            .scalar_subquery()
+        )
+        count_query = (
+            select(func.count(Measurement.id)) # type: ignore
+            .where(*last_30_days)
+            .correlate(None)
+            .scalar_subquery()
+        )
+        
+        query = (
+            select(
+                Measurement,
+                Cow.name.label('cow_name'), # type: ignore
+                avg_weight_query.label('avg_weight'),
+                count_query.label('measurements_30_days')
             )
-            
-            current_measurement = session.exec(current_query).first()
-            
-            if not current_measurement:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"No weight measurements found for cow {cow_id}"
-                )
-            
-            # Get measurements from the last 30 days
-            thirty_days_ago = datetime.now() - timedelta(days=30)
-            
-            avg_query = (
-                select(
-                    func.avg(Measurement.value).label('avg_weight'),
-                    func.count(Measurement.id).label('count') # type: ignore
-                )
-                .where(
-                    Measurement.unit == 'kg',
-                    Measurement.cow_id == cow_id,
-                    Measurement.measured_at >= thirty_days_ago
-                )
+            .outerjoin(Cow, Cow.id == Measurement.cow_id) # type: ignore
+            .where(
+                Measurement.unit == 'kg',
+                Measurement.cow_id == cow_id
             )
-            
-            avg_result = session.exec(avg_query).first()
-            
-            avg_weight = None
-            measurements_count = 0
-            
-            if avg_result and avg_result[0] is not None:
-                avg_weight = round(float(avg_result[0]), 2)
-                measurements_count = int(avg_result[1]) if avg_result[1] else 0
-            
-            # Check if the cow is ill
-            ill = False
-            dif_weight = current_measurement.value - avg_weight if avg_weight is not None else 0
-            if avg_weight and dif_weight < -0.05 * avg_weight:
-                ill = True
-
-            report = CowWeightReport(
-                cow_id=cow_id,
-                cow_name=current_measurement.name or "Unknown",
-                current_weight=round(current_measurement.value, 2),
-                current_weight_date=current_measurement.measured_at,
-                avg_weight_30_days=avg_weight,
-                measurements_30_days=measurements_count,
-                ill=ill
+            .order_by(Measurement.measured_at.desc()) # type: ignore
+            .limit(1)
+        )
+        
+        result = session.exec(query).first()
+        
+        if not result:
+            raise HTTPException(
+                status_code=404,
+                detail=f"No weight measurements found for cow {cow_id}"
             )
-            
-            logger.info(f"Generated weight report for cow {cow_id}")
-            return report
-            
+        
+        current_measurement = result.Measurement
+        
+        avg_weight = None
+        measurements_count = 0
+        
+        if result.avg_weight is not None:
+            avg_weight = round(result.avg_weight, 2)
+            measurements_count = result.measurements_30_days
+        
+        # Check if the cow is ill
+        ill = False
+        dif_weight = current_measurement.value - avg_weight if avg_weight is not None else 0
+        if avg_weight and dif_weight < -0.05 * avg_weight:
+            ill = True
+
+        report = CowWeightReport(
+            cow_id=cow_id,
+            cow_name=result.cow_name or "Unknown",
+            current_weight=round(current_measurement.value, 2),
+            current_weight_date=current_measurement.measured_at,
+            avg_weight_30_days=avg_weight,
+            measurements_30_days=measurements_count,
+            ill=ill
+        )
+        
+        report_cache.set(cache_key, report, settings.REPORT_CACHE_TTL)
+        
+        logger.info(f"Generated weight report for cow {cow_id}")
+        return report
+    
     except HTTPException:
         raise
     except Exception as e:
@@ -10,6 +10,26 @@ class Settings(BaseSettings):
     COWS_DATA_PATH: str = "data/cows.parquet"
     MEASUREMENTS_DATA_PATH: str = "data/measurements.parquet"
     SENSORS_DATA_PATH: str = "data/sensors.parquet"
+    # Stage the measurement parquet files as Arrow IPC next to them
+    MEASUREMENT_STAGE_IPC: bool = False
+    
+    # Database connection pool
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    
+    # Report cache (seconds); historical daily reports cover a closed day
+    REPORT_CACHE_TTL: int = 30
+    REPORT_CACHE_HISTORICAL_TTL: int = 86400
+    REPORT_CACHE_MAXSIZE: int = 1024
+    
+    # Daily reports with more measurements than this are streamed
+    DAILY_REPORT_STREAM_THRESHOLD: int = 1000
+    
+    # Write-behind buffer for single measurements
+    MEASUREMENT_BATCH_SIZE: int = 128
+    MEASUREMENT_FLUSH_INTERVAL: float = 0.1
     
     class Config:
         case_sensitive = True
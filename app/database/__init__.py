@@ -1,7 +1,19 @@
+from typing import Iterator
+from fastapi import Depends, Request
+from sqlmodel import Session
 from app.database.db import Database
 
 def get_db() -> Database:
     """Get the singleton database instance"""
     return Database.get_instance()
 
-__all__ = ["Database", "get_db"]
\ No newline at end of file
+def get_database(request: Request) -> Database:
+    """FastAPI dependency that returns the database instance set up in the app lifespan"""
+    return request.app.state.db
+
+def get_session(db: Database = Depends(get_database)) -> Iterator[Session]:
+    """FastAPI dependency that provides a database session per request"""
+    with db.get_session() as session:
+        yield session
+
+__all__ = ["Database", "get_db", "get_database", "get_session"]
\ No newline at end of file
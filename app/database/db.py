@@ -1,8 +1,11 @@
-from sqlmodel import SQLModel, Session, create_engine, select
+from sqlmodel import SQLModel, Session, create_engine, select, func
+from sqlalchemy import event, insert
+from sqlalchemy.pool import QueuePool
 from pathlib import Path
 import logging
 from typing import Optional
 import polars as pl
+from app.core.config import settings
 from app.schemas.measurement import MeasurementResponse
 from app.models.measurement import Measurement
 from app.models.cow import Cow, Sensor
@@ -12,6 +15,9 @@ logger = logging.getLogger(__name__)
 # Database setup
 DB_PATH = Path("data/IngFarm.db")
 
+# Rows per executemany batch for bulk inserts
+BULK_INSERT_BATCH_SIZE = 1000
+
 
 class Database:
     """Singleton Database class that maintains a persistent SQLite connection using SQLModel"""
@@ -33,18 +39,35 @@ class Database:
             self.db_path = db_path
             self.db_path.parent.mkdir(parents=True, exist_ok=True)
             
-            # Create SQLModel engine
+            # Create SQLModel engine with a shared connection pool
             self.engine = create_engine(
                 f"sqlite:///{self.db_path}",
                 connect_args={"check_same_thread": False},
+                poolclass=QueuePool,
+                pool_size=settings.DB_POOL_SIZE,
+                max_overflow=settings.DB_MAX_OVERFLOW,
+                pool_timeout=settings.DB_POOL_TIMEOUT,
+                pool_recycle=settings.DB_POOL_RECYCLE,
+                pool_pre_ping=True,
                 echo=False  # Set to True for SQL query logging
             )
+            event.listen(self.engine, "connect", self._set_sqlite_pragmas)
             self._initialized = True
             logger.info(f"Database singleton created at {self.db_path}")
         except Exception as e:
             logger.error(f"Failed to establish database connection: {e}")
             raise e
     
+    @staticmethod
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        """Use WAL journaling so readers don't block on writes and commits fsync less often"""
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA mmap_size=268435456")
+        cursor.close()
+    
     @classmethod
     def get_instance(cls) -> 'Database':
         """Get the singleton instance of Database"""
@@ -56,6 +79,9 @@ class Database:
         """Initialize SQLite database and create all tables"""
         # Create all tables
         SQLModel.metadata.create_all(self.engine)
+        # create_all skips existing tables, so add indexes introduced later
+        for index in Measurement.__table__.indexes: # type: ignore
+            index.create(self.engine, checkfirst=True)
         logger.info(f"Database tables created at {self.db_path}")
         
         # Load data from parquet files
@@ -65,35 +91,24 @@ class Database:
         """Load initial data from parquet files into cows and sensors tables"""
         with self.get_session() as session:
             # Check if cows table is already populated
-            cows_count = session.exec(select(Cow)).first()
-            if cows_count is None:
+            cows_count = session.exec(select(func.count()).select_from(Cow)).one()
+            if cows_count == 0:
                 # Load cows data
                 cows_file = Path("data/cows.parquet")
                 if cows_file.exists():
-                    cows_df = pl.read_parquet(cows_file)
-                    for row in cows_df.iter_rows(named=True):
-                        cow = Cow(
-                            id=row['id'],
-                            name=row['name'],
-                            birthdate=row['birthdate']
-                        )
-                        session.add(cow)
+                    cows_df = pl.read_parquet(cows_file, columns=['id', 'name', 'birthdate'])
+                    self._bulk_insert(session, Cow, cows_df.to_dicts())
                     session.commit()
                     logger.info(f"Loaded {len(cows_df)} cows from {cows_file}")
             
             # Check if sensors table is already populated
-            sensors_count = session.exec(select(Sensor)).first()
-            if sensors_count is None:
+            sensors_count = session.exec(select(func.count()).select_from(Sensor)).one()
+            if sensors_count == 0:
                 # Load sensors data
                 sensors_file = Path("data/sensors.parquet")
                 if sensors_file.exists():
-                    sensors_df = pl.read_parquet(sensors_file)
-                    for row in sensors_df.iter_rows(named=True):
-                        sensor = Sensor(
-                            id=row['id'],
-                            unit=row['unit']
-                        )
-                        session.add(sensor)
+                    sensors_df = pl.read_parquet(sensors_file, columns=['id', 'unit'])
+                    self._bulk_insert(session, Sensor, sensors_df.to_dicts())
                     session.commit()
                     logger.info(f"Loaded {len(sensors_df)} sensors from {sensors_file}")
     
@@ -101,6 +116,11 @@ class Database:
         """Get a database session"""
         return Session(self.engine)
     
+    def _bulk_insert(self, session: Session, model: type[SQLModel], rows: list[dict]):
+        """Insert rows with executemany, in batches of BULK_INSERT_BATCH_SIZE"""
+        for start in range(0, len(rows), BULK_INSERT_BATCH_SIZE):
+            session.exec(insert(model), params=rows[start:start + BULK_INSERT_BATCH_SIZE])
+    
     def save_measurement(self, measurement: MeasurementResponse):
         """Save a single measurement to SQLite database"""
         with self.get_session() as session:
@@ -110,29 +130,30 @@ class Database:
                 timestamp=measurement.timestamp,
                 measured_at=measurement.measured_at,
                 value=measurement.value,
-                unit=measurement.unit,
-                name=measurement.name,
-                birthdate=measurement.birthdate
+                unit=measurement.unit
             )
             session.add(db_measurement)
             session.commit()
             logger.info(f"Saved measurement for cow_id {measurement.cow_id} to database")
     
     def save_measurements(self, measurements: list[MeasurementResponse]):
-        """Save measurements to SQLite database"""
+        """
+        Save measurements to SQLite database.
+        Cow name and birthdate are not stored per row; reports join them from Cows.
+        """
+        rows = [
+            {
+                "cow_id": m.cow_id,
+                "sensor_id": m.sensor_id,
+                "timestamp": m.timestamp,
+                "measured_at": m.measured_at,
+                "value": m.value,
+                "unit": m.unit
+            }
+            for m in measurements
+        ]
         with self.get_session() as session:
-            for m in measurements:
-                db_measurement = Measurement(
-                    cow_id=m.cow_id,
-                    sensor_id=m.sensor_id,
-                    timestamp=m.timestamp,
-                    measured_at=m.measured_at,
-                    value=m.value,
-                    unit=m.unit,
-                    name=m.name,
-                    birthdate=m.birthdate
-                )
-                session.add(db_measurement)
+            self._bulk_insert(session, Measurement, rows)
             session.commit()
             logger.info(f"Saved {len(measurements)} measurements to database")
     
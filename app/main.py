@@ -46,9 +46,9 @@ app.include_router(measurements.router, prefix="/api/v1/measurements", tags=["me
 app.include_router(reports.router, prefix="/api/v1/reports", tags=["reports"])
 
 @app.get("/")
-async def root():
+async def root() -> dict[str, str]:
     return {"message": "Welcome to IngFarm API", "version": settings.VERSION}
 
 @app.get("/health")
-async def health_check():
+async def health_check() -> dict[str, str]:
     return {"status": "healthy"}
@@ -1,19 +1,22 @@
 from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
 from typing import ClassVar, Optional
-from datetime import date, datetime
+from datetime import datetime
 
 
 class Measurement(SQLModel, table=True):
     """SQLModel for Measurements table"""
     __tablename__: ClassVar[str] = "Measurements"
+    # Serves the (cow_id, unit) filters and measured_at range/order of the reports
+    __table_args__: ClassVar[tuple] = (
+        Index("ix_meas_cow_unit_time", "cow_id", "unit", "measured_at"),
+    )
     
     id: Optional[int] = Field(default=None, primary_key=True)
-    cow_id: str = Field(index=True)
+    cow_id: str
     sensor_id: str
     timestamp: float
     measured_at: datetime
     value: float
     unit: Optional[str] = None
-    name: Optional[str] = None
-    birthdate: Optional[date] = None
     recorded_at: datetime = Field(default_factory=datetime.utcnow)
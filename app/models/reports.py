@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from datetime import date, datetime
 from typing import Optional, List
 
@@ -16,6 +16,8 @@ class CowWeightReport(BaseModel):
 
 class MeasurementDetail(BaseModel):
     """Schema for individual measurement detail"""
+    model_config = ConfigDict(from_attributes=True)
+    
     cow_id: str
     cow_name: str
     value: float
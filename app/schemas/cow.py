@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from datetime import date
 
 class CowCreate(BaseModel):
@@ -8,6 +8,8 @@ class CowCreate(BaseModel):
 
 class CowResponse(BaseModel):
     """Schema for cow response"""
+    model_config = ConfigDict(from_attributes=True)
+    
     id: str
     name: str
     birthdate: date
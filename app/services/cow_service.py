@@ -1,15 +1,19 @@
 import uuid
-from typing import Optional
+from typing import AsyncIterator, Optional
+from pydantic import TypeAdapter
 from sqlmodel import select
 from app.schemas.cow import CowCreate, CowResponse
 from app.models.cow import Cow
-from app.database import get_db
+from app.database import Database
+
+# Validates a full cow listing in one call
+COWS_ADAPTER = TypeAdapter(list[CowResponse])
 
 class CowService:
     """Service for cow operations"""
     
-    def __init__(self):
-        pass
+    def __init__(self, db: Database):
+        self.db = db
     
     async def create_cow(self, id: str, cow: CowCreate) -> CowResponse:
         """Create a new cow"""
@@ -19,9 +23,7 @@ class CowService:
         except ValueError:
             raise ValueError("Invalid UUID format")
         
-        db = get_db()
-        
-        with db.get_session() as session:
+        with self.db.get_session() as session:
             # Check if cow with this ID already exists
             existing_cow = session.exec(select(Cow).where(Cow.id == id)).first()
             if existing_cow:
@@ -41,9 +43,7 @@ class CowService:
     
     async def get_cow(self, id: str) -> Optional[CowResponse]:
         """Get cow by ID"""
-        db = get_db()
-        
-        with db.get_session() as session:
+        with self.db.get_session() as session:
             cow = session.exec(select(Cow).where(Cow.id == id)).first()
             
             if not cow:
@@ -53,8 +53,14 @@ class CowService:
     
     async def list_cows(self) -> list[CowResponse]:
         """List all cows"""
-        db = get_db()
-        
-        with db.get_session() as session:
-            cows = session.exec(select(Cow)).all()
-            return [CowResponse(id=cow.id, name=cow.name, birthdate=cow.birthdate) for cow in cows]
+        with self.db.get_session() as session:
+            cows = session.exec(select(Cow.id, Cow.name, Cow.birthdate)).all()
+            return COWS_ADAPTER.validate_python(cows, from_attributes=True)
+    
+    async def iter_cows(self) -> AsyncIterator[CowResponse]:
+        """Iterate over all cows without materializing the full list"""
+        with self.db.get_session() as session:
+            query = select(Cow.id, Cow.name, Cow.birthdate).execution_options(yield_per=500)
+            for id, name, birthdate in session.exec(query):
+                # Rows come straight from the database, so skip validation
+                yield CowResponse.model_construct(id=id, name=name, birthdate=birthdate)
@@ -0,0 +1,88 @@
+import asyncio
+import logging
+from typing import Optional
+from fastapi.concurrency import run_in_threadpool
+from app.database import Database
+from app.schemas.measurement import MeasurementResponse
+
+logger = logging.getLogger(__name__)
+
+
+class MeasurementBuffer:
+    """
+    Buffers measurements in memory and writes them to the database in batches,
+    so that many single-measurement requests share one commit.
+    """
+    
+    def __init__(self, db: Database, max_batch_size: int = 128, flush_interval: float = 0.1):
+        self.db = db
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self._queue: Optional[asyncio.Queue[Optional[MeasurementResponse]]] = None
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        """Start the background flush loop on the running event loop"""
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+            logger.info("Measurement buffer started")
+    
+    async def stop(self):
+        """Stop the flush loop after writing any measurements still queued"""
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        # The sentinel ends the flush loop once everything queued before it is written
+        self._queue.put_nowait(None)
+        await task
+        logger.info("Measurement buffer stopped")
+    
+    async def put(self, measurement: MeasurementResponse):
+        """Queue a measurement for the next batch write"""
+        if self._task is None:
+            # Not running (e.g. outside the app lifespan), write it straight away
+            await self._flush([measurement])
+            return
+        self._queue.put_nowait(measurement)
+    
+    async def _drain(self) -> tuple[list[MeasurementResponse], bool]:
+        """
+        Wait for the next measurement, then collect more until the batch is
+        full or flush_interval has elapsed.
+        
+        Returns:
+            tuple: (batch of measurements, whether the stop sentinel was reached)
+        """
+        batch = []
+        item = await self._queue.get()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+        
+        while item is not None:
+            batch.append(item)
+            timeout = deadline - loop.time()
+            if len(batch) >= self.max_batch_size or timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+        
+        return batch, item is None
+    
+    async def _flush(self, batch: list[MeasurementResponse]):
+        """Write a batch of measurements without blocking the event loop"""
+        try:
+            await run_in_threadpool(self.db.save_measurements, batch)
+        except Exception as e:
+            logger.error(f"Error saving {len(batch)} buffered measurements: {str(e)}")
+    
+    async def _run(self):
+        """Flush loop: drain the queue in batches until the stop sentinel arrives"""
+        while True:
+            batch, stopping = await self._drain()
+            if batch:
+                await self._flush(batch)
+            if stopping:
+                return
@@ -1,34 +1,28 @@
+from typing import Optional
 from app.schemas.measurement import MeasurementResponse
+from app.core.config import settings
+from app.database import Database
 from app.services.cow_service import CowService
-from simulators.read_measurements import MeasurementReader
+from simulators.read_measurements import get_measurement_reader
 
 class MeasurementService:
     """Service for measurement operations"""
     
-    def __init__(self):
-        self.reader = MeasurementReader()
-        self.cow_service = CowService()
+    def __init__(self, db: Database):
+        self.reader = get_measurement_reader(stage_ipc=settings.MEASUREMENT_STAGE_IPC)
+        self.cow_service = CowService(db)
     
     async def get_next_measurement(self, cow_id: str) -> MeasurementResponse:
         """Get next measurement for a cow"""
         measurement = self.reader.get_next_measurement(cow_id)
-        return MeasurementResponse(**measurement.model_dump())
+        return MeasurementResponse(**measurement._asdict())
     
-    async def reset_index(self, cow_id: str):
-        """Reset measurement index for a cow"""
+    async def reset_index(self, cow_id: Optional[str] = None):
+        """Reset measurement index for a cow, or for all cows if cow_id is None"""
         self.reader.reset_index(cow_id)
     
     async def get_all_cows_measurements(self) -> list[MeasurementResponse]:
         """Get current measurement for all cows"""
-        cows = await self.cow_service.list_cows()
-        measurements = []
-        
-        for cow in cows:
-            try:
-                measurement = self.reader.get_next_measurement(cow.id)
-                measurements.append(MeasurementResponse(**measurement.model_dump()))
-            except ValueError:
-                # Skip cows without measurements
-                continue
-        
-        return measurements
+        cow_ids = [cow.id async for cow in self.cow_service.iter_cows()]
+        # Cows without measurements are skipped by the reader
+        return [MeasurementResponse(**m._asdict()) for m in self.reader.get_next_measurements(cow_ids)]
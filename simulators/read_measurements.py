@@ -1,15 +1,23 @@
 
 
-from typing import Optional
+from typing import Mapping, NamedTuple, Optional
+from types import MappingProxyType
 from datetime import date, datetime
-from pydantic import BaseModel
+from functools import lru_cache
+import os
+import tempfile
 import polars as pl
 from pathlib import Path
-import time
+import logging
 
+logger = logging.getLogger(__name__)
 
-class Measurement(BaseModel):
-    """Pydantic model for measurement data"""
+MEASUREMENT_COLUMNS = ['cow_id', 'sensor_id', 'value']  # timestamp is replaced when a record is read
+RECORD_COLUMNS = ['sensor_id', 'value', 'unit', 'name', 'birthdate']  # Order of the cached record tuples
+
+
+class MeasurementRow(NamedTuple):
+    """Measurement data produced by the reader. Callers that need validation build a model from _asdict()"""
     cow_id: str
     sensor_id: str
     timestamp: float
@@ -20,199 +28,258 @@ class Measurement(BaseModel):
     birthdate: Optional[date] = None
 
 
+def _scan_table(parquet_file: Path, columns: list[str], stage_ipc: bool) -> pl.LazyFrame:
+    """
+    Lazily scan the given columns of a parquet file, through its staged Arrow IPC
+    copy when stage_ipc is set. The IPC file is (re)written when it is missing,
+    older than the parquet file or lacks a column. Staging failures fall back to
+    scanning the parquet file.
+    
+    Args:
+        parquet_file: Path of the parquet file
+        columns: Columns to scan
+        stage_ipc: Whether to go through the staged Arrow IPC file
+        
+    Returns:
+        pl.LazyFrame: Scan of the selected columns
+    """
+    parquet_scan = pl.scan_parquet(parquet_file).select(columns)
+    if not stage_ipc:
+        return parquet_scan
+    
+    ipc_file = parquet_file.with_suffix('.arrow')
+    try:
+        is_current = ipc_file.exists() and ipc_file.stat().st_mtime >= parquet_file.stat().st_mtime
+        if is_current:
+            try:
+                is_current = set(columns) <= set(pl.scan_ipc(ipc_file).collect_schema().names())
+            except pl.exceptions.PolarsError:
+                is_current = False  # Truncated or corrupt, stage it again
+        if not is_current:
+            # Write next to the target and swap it in, so readers never see a partial file
+            fd, tmp_name = tempfile.mkstemp(dir=ipc_file.parent, prefix=f"{ipc_file.name}.", suffix='.tmp')
+            os.close(fd)
+            try:
+                parquet_scan.sink_ipc(tmp_name)
+                os.replace(tmp_name, ipc_file)
+            finally:
+                Path(tmp_name).unlink(missing_ok=True)
+        staged_scan = pl.scan_ipc(ipc_file).select(columns)
+        staged_scan.collect_schema()  # Reads the footer now, so a bad file fails here rather than at collect
+        return staged_scan
+    except (OSError, pl.exceptions.PolarsError) as e:
+        logger.warning(f"Could not stage {parquet_file} as Arrow IPC, reading parquet: {str(e)}")
+        return parquet_scan
+
+
+@lru_cache(maxsize=16)
+def _load_records_by_cow(measurements_file: Path, sensor_file: Path, cows_file: Path, stage_ipc: bool, modified_times: tuple[float, ...]) -> dict[str, pl.DataFrame]:
+    """
+    Read and join the measurement, sensor and cow files, grouped by cow.
+    Cached per file set; modified_times is part of the key so rewritten files are read again.
+    
+    Args:
+        measurements_file: Path of the measurements parquet file
+        sensor_file: Path of the sensors parquet file
+        cows_file: Path of the cows parquet file
+        stage_ipc: Whether to read through staged Arrow IPC files
+        modified_times: Modification times of the three files
+        
+    Returns:
+        dict[str, pl.DataFrame]: Joined records of each cow, in measurement order
+    """
+    # Only scan the columns the reader uses
+    measurements: pl.LazyFrame = _scan_table(measurements_file, MEASUREMENT_COLUMNS, stage_ipc)
+    sensors: pl.LazyFrame = _scan_table(sensor_file, ['id', 'unit'], stage_ipc)
+    cows: pl.LazyFrame = _scan_table(cows_file, ['id', 'name', 'birthdate'], stage_ipc)
+    # Join the sensor unit and cow info once, keeping measurement order.
+    # The streaming engine runs the scans and joins in batches.
+    joined_df: pl.DataFrame = (
+        measurements
+        .join(sensors.rename({'id': 'sensor_id'}), on='sensor_id', how='left', maintain_order='left')
+        .join(cows.rename({'id': 'cow_id'}), on='cow_id', how='left', maintain_order='left')
+        # A null value takes the cow's previous value with the same unit, or 0 if there is none
+        .with_columns(pl.col('value').fill_null(strategy='forward').over(['cow_id', 'unit']).fill_null(0.0))
+        .collect(engine='streaming')
+    )
+    # Group by cow once so per-cow lookups don't scan the whole frame.
+    # Only the partitions are kept, they hold every row.
+    return {cow_id: records for (cow_id,), records in joined_df.partition_by('cow_id', as_dict=True).items()}
+
+
 class MeasurementReader:
     """
     Reads measurements from parquet file and returns consecutive records for a cow_id.
     Cycles back to the beginning when reaching the end of records for a specific cow.
     """
     
-    def __init__(self, measurements_file: str = "data/measurements.parquet", sensor_file: str = "data/sensors.parquet", cows_file: str = "data/cows.parquet"):
-        """Initialize the reader with parquet file path"""
+    def __init__(self, measurements_file: str = "data/measurements.parquet", sensor_file: str = "data/sensors.parquet", cows_file: str = "data/cows.parquet", stage_ipc: bool = False):
+        """
+        Initialize the reader with parquet file path.
+        With stage_ipc, the parquet contents are staged as Arrow IPC files next to
+        them, so later readers memory-map the IPC files instead of decoding parquet.
+        """
         self.measurements_file: Path = Path(measurements_file)
         self.sensor_file: Path = Path(sensor_file)
         self.cows_file: Path = Path(cows_file)
-        self.df: pl.DataFrame = pl.read_parquet(self.measurements_file)
-        self.sensors_df: pl.DataFrame = pl.read_parquet(self.sensor_file)
-        self.cows_df: pl.DataFrame = pl.read_parquet(self.cows_file)
-        self.indices: dict[str, int] = {}  # Track current index for each cow_id
-        self.cow_records: dict[str, pl.DataFrame] = {}  # Cache filtered records for each cow_id
-        self.processed_records: dict[str, list[dict]] = {}  # Cache list of all processed records per cow
+        self.stage_ipc: bool = stage_ipc
+        # Readers over the same unchanged files share one load and join
+        modified_times = tuple(f.stat().st_mtime for f in (self.measurements_file, self.sensor_file, self.cows_file))
+        self.records_by_cow: dict[str, pl.DataFrame] = dict(_load_records_by_cow(
+            self.measurements_file, self.sensor_file, self.cows_file, stage_ipc, modified_times
+        ))
+        self.cow_ids: list[str] = list(self.records_by_cow)  # The set of cows is fixed once the files are read
+        # Per-cow state lives in lists indexed by a dense slot per cow, so a read does
+        # one dict probe for the slot and plain list indexing after that
+        self.cow_slots: dict[str, int] = {cow_id: slot for slot, cow_id in enumerate(self.cow_ids)}
+        self.slot_rows: list[Optional[list[tuple]]] = [None] * len(self.cow_ids)  # Record tuples, cached on first read
+        self.slot_counts: list[int] = [0] * len(self.cow_ids)  # Number of records per cow
+        self.slot_positions: list[int] = [0] * len(self.cow_ids)  # Current index per cow
     
-    def _initialize_cow_records(self, cow_id: str) -> None:
+    @property
+    def indices(self) -> Mapping[str, int]:
         """
-        Initialize and cache records for a cow_id if not already cached.
+        Read-only snapshot of the current index for each cow whose records are cached.
+        Use reset_index to move a cow back to its first record.
+        """
+        return MappingProxyType({
+            cow_id: self.slot_positions[slot]
+            for cow_id, slot in self.cow_slots.items() if self.slot_rows[slot] is not None
+        })
+    
+    @property
+    def cow_records(self) -> Mapping[str, list[tuple]]:
+        """Read-only snapshot of the cached record tuples for each cow, in RECORD_COLUMNS order"""
+        return MappingProxyType({
+            cow_id: self.slot_rows[slot]
+            for cow_id, slot in self.cow_slots.items() if self.slot_rows[slot] is not None
+        })
+    
+    def _load_slot(self, slot: int) -> None:
+        """
+        Cache a cow's records as positional tuples and start it at index 0.
         
         Args:
-            cow_id: The ID of the cow
-            
-        Raises:
-            ValueError: If no measurements found for the cow_id
+            slot: The cow's slot
         """
-        if cow_id not in self.cow_records:
-            cow_data = self.df.filter(pl.col('cow_id') == cow_id)
-            if cow_data.height == 0:
-                raise ValueError(f"No measurements found for cow_id: {cow_id}")
-            self.cow_records[cow_id] = cow_data
-            self.indices[cow_id] = 0
+        rows = self.records_by_cow[self.cow_ids[slot]].select(RECORD_COLUMNS).rows()
+        self.slot_rows[slot] = rows
+        self.slot_counts[slot] = len(rows)
+        self.slot_positions[slot] = 0
     
-    def _get_current_record(self, cow_id: str) -> tuple[dict, int]:
+    def _initialize_cow_records(self, cow_id: str) -> int:
         """
-        Get the current record for a cow_id based on its index.
+        Initialize and cache records for a cow_id if not already cached.
         
         Args:
             cow_id: The ID of the cow
             
         Returns:
-            tuple: (record dict, current index)
+            int: The cow's slot
+            
+        Raises:
+            ValueError: If no measurements found for the cow_id
         """
-        records: pl.DataFrame = self.cow_records[cow_id]
-        current_index: int = self.indices[cow_id]
-        record: dict = records.row(current_index, named=True)
-        return record, current_index
+        slot = self.cow_slots.get(cow_id)
+        if slot is None:
+            raise ValueError(f"No measurements found for cow_id: {cow_id}")
+        if self.slot_rows[slot] is None:
+            self._load_slot(slot)
+        return slot
     
-    def _enrich_with_sensor_unit(self, record: dict) -> Optional[str]:
+    def _next_records(self, cow_id: str, n: int) -> list[MeasurementRow]:
         """
-        Add sensor unit to the record by joining with sensors table.
+        Build the next n consecutive records for a cow_id and advance its index.
+        The records are stamped with the current time.
         
         Args:
-            record: The measurement record dict
+            cow_id: The ID of the cow
+            n: Number of records to build
             
         Returns:
-            The unit value if found, None otherwise
-        """
-        current_unit = None
-        if 'sensor_id' in record:
-            sensor_unit = self.sensors_df.filter(pl.col('id') == record['sensor_id'])
-            if sensor_unit.height > 0:
-                current_unit = sensor_unit.row(0, named=True)['unit']
-                record['unit'] = current_unit
-        return current_unit
-    
-    def _enrich_with_cow_info(self, record: dict) -> None:
+            list[MeasurementRow]: The enriched records in order
         """
-        Add cow name and birthdate to the record by joining with cows table.
+        # Initialize cow records if first time
+        slot = self._initialize_cow_records(cow_id)
         
-        Args:
-            record: The measurement record dict
-        """
-        if 'cow_id' in record:
-            cow_info = self.cows_df.filter(pl.col('id') == record['cow_id'])
-            if cow_info.height > 0:
-                cow_row = cow_info.row(0, named=True)
-                record['name'] = cow_row['name']
-                record['birthdate'] = cow_row['birthdate']
-    
-    def _replace_null_value(self, record: dict, cow_id: str, current_index: int, current_unit: Optional[str]) -> None:
-        """
-        Replace null value with the value from a previous record with matching unit.
+        # Everything used per record is looked up once, the loop only unpacks cached tuples
+        rows: list[tuple] = self.slot_rows[slot]
+        record_count: int = self.slot_counts[slot]
+        start_index: int = self.slot_positions[slot]
+        measured_at = datetime.now()
+        timestamp = measured_at.timestamp()
         
-        Args:
-            record: The measurement record dict
-            cow_id: The ID of the cow
-            current_index: Current index in the cow's records
-            current_unit: The unit of the current measurement
-        """
-        if record['value'] is None:
-            if current_index == 0:
-                # First record, default to 0
-                record['value'] = 0
-            else:
-                # Initialize processed records list for this cow if not exists
-                if cow_id not in self.processed_records:
-                    self.processed_records[cow_id] = []
-                
-                # Iterate backwards through previously processed records to find one with the same unit
-                found_value = None
-                for prev_record in reversed(self.processed_records[cow_id]):
-                    # Get unit for previous record
-                    prev_unit: Optional[str] = prev_record.get('unit')
-                    
-                    # Check if units match and previous value is not null
-                    if prev_unit == current_unit and prev_record.get('value') is not None:
-                        found_value = prev_record['value']
-                        break
-                
-                # Use found value or default to 0 if no matching unit found
-                record['value'] = found_value if found_value is not None else 0
-    
-    def _store_processed_record(self, cow_id: str, record: dict) -> None:
-        """
-        Store the processed record for future null value replacements.
+        records = []
+        for offset in range(n):
+            sensor_id, value, unit, name, birthdate = rows[(start_index + offset) % record_count]
+            records.append(MeasurementRow(cow_id, sensor_id, timestamp, measured_at, value, unit, name, birthdate))
         
-        Args:
-            cow_id: The ID of the cow
-            record: The measurement record dict
-        """
-        if cow_id not in self.processed_records:
-            self.processed_records[cow_id] = []
-        self.processed_records[cow_id].append(dict(record))
+        # Advance to the next index, cycling back to the beginning at the end
+        self.slot_positions[slot] = (start_index + n) % record_count
+        return records
     
-    def _advance_index(self, cow_id: str) -> None:
+    def get_next_measurement(self, cow_id: str) -> MeasurementRow:
         """
-        Move to the next index for the cow, cycling back to the beginning if at the end.
+        Get the next consecutive measurement for the specified cow_id.
+        Cycles back to the beginning when reaching the end.
         
         Args:
             cow_id: The ID of the cow
+            
+        Returns:
+            MeasurementRow: The measurement data
         """
-        records: pl.DataFrame = self.cow_records[cow_id]
-        current_index: int = self.indices[cow_id]
-        self.indices[cow_id] = (current_index + 1) % records.height
+        return self._next_records(cow_id, 1)[0]
     
-    def _update_timestamp(self, record: dict) -> None:
+    def get_next_n_measurements(self, cow_id: str, n: int) -> list[MeasurementRow]:
         """
-        Update the timestamp of the record with the current timestamp.
+        Get the next n consecutive measurements for the specified cow_id.
+        Same records as n calls to get_next_measurement, but the cow's records,
+        info and index are looked up once and the batch shares one timestamp.
         
         Args:
-            record: The measurement record dict
+            cow_id: The ID of the cow
+            n: Number of measurements to return
+            
+        Returns:
+            list[MeasurementRow]: The measurements in order
         """
-        current_time = time.time()
-        record['timestamp'] = current_time
-        # Adding a readable measured_at field
-        record['measured_at'] = datetime.fromtimestamp(current_time)
-        
-    def get_next_measurement(self, cow_id: str) -> Measurement:
+        return self._next_records(cow_id, n)
+    
+    def get_next_measurements(self, cow_ids: list[str]) -> list[MeasurementRow]:
         """
-        Get the next consecutive measurement for the specified cow_id.
-        Cycles back to the beginning when reaching the end.
+        Get the next measurement for each of the specified cow_ids.
+        Cows without measurements are skipped.
         
         Args:
-            cow_id: The ID of the cow
+            cow_ids: The IDs of the cows
             
         Returns:
-            Measurement: A Pydantic model containing the measurement data
+            list[MeasurementRow]: One measurement per cow that has records
         """
-        # Initialize cow records if first time
-        self._initialize_cow_records(cow_id)
-        
-        # Get current record and index
-        record, current_index = self._get_current_record(cow_id)
+        # One clock read for the whole batch, so every cow's record shares measured_at
+        measured_at = datetime.now()
+        timestamp = measured_at.timestamp()
+        slot_rows, slot_counts, slot_positions = self.slot_rows, self.slot_counts, self.slot_positions
         
-        # Enrich record with sensor unit
-        current_unit = self._enrich_with_sensor_unit(record)
-        
-        # Enrich record with cow information
-        self._enrich_with_cow_info(record)
-        
-        # Replace null values if needed
-        self._replace_null_value(record, cow_id, current_index, current_unit)
-        
-        # Update timestamp with current time
-        self._update_timestamp(record)
-        
-        # Store processed record
-        self._store_processed_record(cow_id, record)
-        
-        # Advance to next index
-        self._advance_index(cow_id)
-
-        # Return as Pydantic model
-        return Measurement(**record)
+        records = []
+        for cow_id in cow_ids:
+            slot = self.cow_slots.get(cow_id)
+            if slot is None:
+                continue
+            if slot_rows[slot] is None:
+                self._load_slot(slot)
+            position = slot_positions[slot]
+            sensor_id, value, unit, name, birthdate = slot_rows[slot][position]
+            records.append(MeasurementRow(cow_id, sensor_id, timestamp, measured_at, value, unit, name, birthdate))
+            slot_positions[slot] = (position + 1) % slot_counts[slot]
+        return records
     
     def get_all_cow_ids(self) -> list:
         """Get list of all unique cow IDs in the measurements"""
-        return self.df['cow_id'].unique().to_list()
+        return self.cow_ids
     
-    def reset_index(self, cow_id: str):
+    def reset_index(self, cow_id: Optional[str] = None):
         """
         Reset the index for a specific cow or all cows
         
@@ -220,9 +287,17 @@ class MeasurementReader:
             cow_id: The cow ID to reset. If None, reset all.
         """
         if cow_id is None:
-            self.indices = {}
-        elif cow_id in self.indices:
-            self.indices[cow_id] = 0
+            # Zero in place so the cached cow records stay loaded
+            for slot in range(len(self.slot_positions)):
+                self.slot_positions[slot] = 0
+        elif cow_id in self.cow_slots:
+            self.slot_positions[self.cow_slots[cow_id]] = 0
+
+
+@lru_cache(maxsize=1)
+def get_measurement_reader(stage_ipc: bool = False) -> MeasurementReader:
+    """Return the process-wide MeasurementReader, loading the parquet files on first use"""
+    return MeasurementReader(stage_ipc=stage_ipc)
 
 
 # Example usage functions
@@ -239,9 +314,8 @@ def example_usage():
         cow_id = cow_ids[0]
         print(f"\nGetting measurements for cow: {cow_id}")
         
-        # Get 5 consecutive measurements (will cycle if needed)
-        for i in range(10):
-            measurement = reader.get_next_measurement(cow_id)
+        # Get 10 consecutive measurements (will cycle if needed)
+        for i, measurement in enumerate(reader.get_next_n_measurements(cow_id, 10)):
             print(f"  Measurement {i+1}: {measurement}")
 
 if __name__ == "__main__":
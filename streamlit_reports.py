@@ -1,5 +1,6 @@
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
@@ -8,6 +9,9 @@ import os
 
 # Configuration
 API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8000/api/v1")
+CACHE_TTL = 60  # seconds
+COWS_CACHE_TTL = 600  # seconds, the cow list rarely changes
+REQUEST_TIMEOUT = 5  # seconds
 
 st.set_page_config(
     page_title="Cow Reports Dashboard",
@@ -19,13 +23,41 @@ st.set_page_config(
 st.title("🐄 Cow Reports Dashboard")
 st.markdown("---")
 
-# Helper function to fetch data
-def fetch_data(endpoint):
+# Helper functions to fetch data
+@st.cache_resource
+def get_http_session():
+    """Pooled HTTP session shared across reruns, so API calls reuse keep-alive connections"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def _get_json(endpoint):
+    """GET an API endpoint and return the decoded JSON body"""
+    response = get_http_session().get(f"{API_BASE_URL}{endpoint}", timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+# Responses are cached per endpoint so reruns don't hit the API again.
+# Errors raise out of the cached functions, so failures are never cached.
+# Each TTL needs its own function, Streamlit keys a cache by the decorated function.
+@st.cache_data(ttl=COWS_CACHE_TTL, show_spinner=False)
+def _get_cows_json(endpoint):
+    """GET a cow list endpoint, cached for COWS_CACHE_TTL"""
+    return _get_json(endpoint)
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def _get_report_json(endpoint):
+    """GET a report endpoint, cached for CACHE_TTL"""
+    return _get_json(endpoint)
+
+def fetch_data(endpoint, long_lived=False):
     """Fetch data from API endpoint"""
     try:
-        response = requests.get(f"{API_BASE_URL}{endpoint}")
-        response.raise_for_status()
-        return response.json()
+        if long_lived:
+            return _get_cows_json(endpoint)
+        return _get_report_json(endpoint)
     except requests.exceptions.RequestException as e:
         st.error(f"Error fetching data: {str(e)}")
         return None
@@ -34,7 +66,7 @@ def fetch_data(endpoint):
 st.sidebar.header("🐄 Select Cow")
 
 # Fetch list of cows
-cows_data = fetch_data("/cows/")
+cows_data = fetch_data("/cows/", long_lived=True)
 if cows_data:
     cow_options = {f"{cow['name']} (ID: {cow['id'][:8]}...)": cow for cow in cows_data}
     selected_cow_name = st.sidebar.selectbox("Choose a cow", list(cow_options.keys()))
@@ -52,6 +84,10 @@ else:
     selected_cow_id = None
     selected_cow = None
 
+if st.sidebar.button("🔄 Clear cache", use_container_width=True):
+    st.cache_data.clear()
+    st.rerun()
+
 # Navigation
 st.sidebar.markdown("---")
 st.sidebar.header("📊 Reports")
@@ -153,6 +189,7 @@ if selected_cow_id:
             st.write("")
             st.write("")
             if st.button("🔄 Refresh Data", use_container_width=True):
+                _get_report_json.clear()
                 st.rerun()
         
         # Fetch daily report
@@ -193,16 +230,17 @@ if selected_cow_id:
                 st.plotly_chart(fig, use_container_width=True)
                 
                 # Statistics
+                stats = df_measurements['value'].agg(['max', 'min', 'mean'])
                 col1, col2, col3 = st.columns(3)
                 
                 with col1:
-                    st.metric("Maximum", f"{df_measurements['value'].max():.2f} L")
+                    st.metric("Maximum", f"{stats['max']:.2f} L")
                 
                 with col2:
-                    st.metric("Minimum", f"{df_measurements['value'].min():.2f} L")
+                    st.metric("Minimum", f"{stats['min']:.2f} L")
                 
                 with col3:
-                    st.metric("Average", f"{df_measurements['value'].mean():.2f} L")
+                    st.metric("Average", f"{stats['mean']:.2f} L")
                 
                 st.markdown("---")
                 
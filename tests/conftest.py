@@ -0,0 +1,15 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+
+
+@pytest.fixture(scope="session")
+def client():
+    """
+    TestClient shared by the whole test session.
+    
+    The app lifespan is not entered: API tests mock the database and
+    services, and startup would seed data/IngFarm.db and start the
+    background measurement writer against it.
+    """
+    return TestClient(app)
@@ -1,23 +1,23 @@
 import pytest
-from fastapi.testclient import TestClient
-from unittest.mock import patch, AsyncMock
+from unittest.mock import Mock, AsyncMock
 from app.main import app
+from app.api.cows import get_cow_service
 from app.schemas.cow import CowResponse
 
-client = TestClient(app)
-
 
 @pytest.fixture
 def mock_cow_service():
-    """Mock CowService"""
-    with patch('app.api.cows.cow_service') as mock_service:
-        yield mock_service
+    """Mock CowService, injected through a dependency override"""
+    mock_service = Mock()
+    app.dependency_overrides[get_cow_service] = lambda: mock_service
+    yield mock_service
+    app.dependency_overrides.pop(get_cow_service, None)
 
 
 class TestCowsEndpoints:
     """Tests for cow endpoints"""
     
-    def test_list_cows(self, mock_cow_service):
+    def test_list_cows(self, client, mock_cow_service):
         """Test GET /cows/ - list all cows"""
         # Mock cow data
         mock_cows = [
@@ -35,7 +35,7 @@ class TestCowsEndpoints:
         assert data[0]["id"] == "cow-1"
         assert data[0]["name"] == "Bessie"
     
-    def test_get_cow_by_id(self, mock_cow_service):
+    def test_get_cow_by_id(self, client, mock_cow_service):
         """Test GET /cows/{cow_id} - get specific cow"""
         mock_cow = CowResponse(id="cow-1", name="Bessie", birthdate="2020-01-01")
         mock_cow_service.get_cow = AsyncMock(return_value=mock_cow)
@@ -47,7 +47,7 @@ class TestCowsEndpoints:
         assert data["id"] == "cow-1"
         assert data["name"] == "Bessie"
     
-    def test_get_cow_not_found(self, mock_cow_service):
+    def test_get_cow_not_found(self, client, mock_cow_service):
         """Test GET /cows/{cow_id} - cow not found"""
         mock_cow_service.get_cow = AsyncMock(return_value=None)
         
@@ -56,7 +56,7 @@ class TestCowsEndpoints:
         assert response.status_code == 404
         assert "not found" in response.json()["detail"].lower()
     
-    def test_create_cow(self, mock_cow_service):
+    def test_create_cow(self, client, mock_cow_service):
         """Test POST /cows/{cow_id} - create new cow"""
         new_cow_data = {
             "name": "Bessie",
@@ -1,14 +1,10 @@
 import pytest
-from fastapi.testclient import TestClient
-from app.main import app
-
-client = TestClient(app)
 
 
 class TestHealthAndRoot:
     """Tests for health check and root endpoints"""
     
-    def test_root_endpoint(self):
+    def test_root_endpoint(self, client):
         """Test GET / - root endpoint"""
         response = client.get("/")
         
@@ -17,14 +13,14 @@ class TestHealthAndRoot:
         assert "message" in data
         assert "Cow" in data["message"] or "API" in data["message"]
     
-    def test_docs_endpoint(self):
+    def test_docs_endpoint(self, client):
         """Test GET /docs - OpenAPI documentation"""
         response = client.get("/docs")
         
         assert response.status_code == 200
         assert "text/html" in response.headers["content-type"]
     
-    def test_openapi_json(self):
+    def test_openapi_json(self, client):
         """Test GET /openapi.json - OpenAPI schema"""
         response = client.get("/openapi.json")
         
@@ -1,32 +1,34 @@
 import pytest
-from fastapi.testclient import TestClient
-from unittest.mock import Mock, patch, MagicMock, AsyncMock
+from unittest.mock import Mock, AsyncMock
 from datetime import datetime
 from app.main import app
+from app.api.measurements import get_measurement_buffer, get_measurement_service
 from app.schemas.measurement import MeasurementResponse
 
-client = TestClient(app)
-
 
 @pytest.fixture
-def mock_db():
-    """Mock database"""
-    with patch('app.api.measurements.db') as mock_database:
-        mock_database.save_measurements = Mock()
-        yield mock_database
+def mock_measurement_buffer():
+    """Mock MeasurementBuffer, injected through a dependency override"""
+    mock_buffer = Mock()
+    mock_buffer.put = AsyncMock()
+    app.dependency_overrides[get_measurement_buffer] = lambda: mock_buffer
+    yield mock_buffer
+    app.dependency_overrides.pop(get_measurement_buffer, None)
 
 
 @pytest.fixture
 def mock_measurement_service():
-    """Mock MeasurementService"""
-    with patch('app.api.measurements.measurement_service') as mock_service:
-        yield mock_service
+    """Mock MeasurementService, injected through a dependency override"""
+    mock_service = Mock()
+    app.dependency_overrides[get_measurement_service] = lambda: mock_service
+    yield mock_service
+    app.dependency_overrides.pop(get_measurement_service, None)
 
 
 class TestMeasurementsEndpoints:
     """Tests for measurement endpoints"""
     
-    def test_get_next_measurement(self, mock_db, mock_measurement_service):
+    def test_get_next_measurement(self, client, mock_measurement_buffer, mock_measurement_service):
         """Test GET /measurements/{cow_id} - get next measurement"""
         # Mock measurement data
         mock_measurement = MeasurementResponse(
@@ -48,10 +50,10 @@ class TestMeasurementsEndpoints:
         assert data["cow_id"] == "cow-1"
         assert data["value"] == 25.5
         assert data["unit"] == "L"
-        # Verify db.save_measurements was called
-        mock_db.save_measurements.assert_called_once()
+        # Verify the measurement was queued for the next batch write
+        mock_measurement_buffer.put.assert_awaited_once_with(mock_measurement)
     
-    def test_get_next_measurement_not_found(self, mock_measurement_service):
+    def test_get_next_measurement_not_found(self, client, mock_measurement_service):
         """Test GET /measurements/{cow_id} - cow not found"""
         mock_measurement_service.get_next_measurement = AsyncMock(side_effect=ValueError("Cow not found"))
         
@@ -1,104 +1,189 @@
 import pytest
-from fastapi.testclient import TestClient
-from unittest.mock import Mock, patch, MagicMock
 from datetime import datetime, date, timedelta
+from types import SimpleNamespace
 from app.main import app
+from app.api.reports import report_cache
+from app.core.config import settings
+from app.database import get_session
 from app.models.measurement import Measurement
 
-client = TestClient(app)
 
+FIXED_NOW = datetime(2024, 1, 1, 12, 0, 0)
+FIRST_MEASUREMENT = datetime(2023, 1, 1, 10, 0, 0)
+LAST_MEASUREMENT = datetime(2023, 12, 31, 18, 0, 0)
+DT_AM = datetime(2023, 6, 15, 10, 0, 0)
+DT_PM = datetime(2023, 6, 15, 16, 0, 0)
+
+
+def weight_row(avg_weight, measurements_30_days):
+    """Row of the weight report query: current weight measurement with the 30-day aggregates"""
+    current = Measurement(
+        id=1,
+        cow_id="cow-1",
+        sensor_id="sensor-2",
+        timestamp=1234567890.0,
+        measured_at=FIXED_NOW,
+        value=520.5,
+        unit="kg",
+        recorded_at=FIXED_NOW
+    )
+    return SimpleNamespace(
+        Measurement=current, cow_name="Bessie", avg_weight=avg_weight, measurements_30_days=measurements_30_days
+    )
+
+
+@pytest.fixture(autouse=True)
+def clear_report_cache():
+    """Start every test with an empty report cache"""
+    report_cache.clear()
+    yield
+    report_cache.clear()
+
+
+class FakeResult:
+    """Stub for a query result, returning prebuilt rows"""
+    
+    def __init__(self, one=None, first=None, all_=(), partitions=()):
+        self._one = one
+        self._first = first
+        self._all = all_
+        self._partitions = partitions
+    
+    def one(self):
+        return self._one
+    
+    def first(self):
+        return self._first
+    
+    def all(self):
+        return list(self._all)
+    
+    def partitions(self, size=None):
+        return iter(self._partitions)
 
-@pytest.fixture
-def mock_db_session():
-    """Mock database session"""
-    session = MagicMock()
-    return session
+
+class FakeSession:
+    """Stub for a database session, returning the queued results in order from exec()"""
+    
+    def __init__(self):
+        self.reset()
+    
+    def reset(self, results=()):
+        self.results = list(results)
+        self.exec_count = 0
+    
+    def exec(self, statement, *args, **kwargs):
+        self.exec_count += 1
+        return self.results.pop(0)
+
+
+@pytest.fixture(scope="module")
+def fake_session():
+    """Fake database session, overriding the session dependency for the whole module"""
+    session = FakeSession()
+    app.dependency_overrides[get_session] = lambda: session
+    yield session
+    app.dependency_overrides.pop(get_session, None)
 
 
 @pytest.fixture
-def mock_db(mock_db_session):
-    """Mock database singleton"""
-    with patch('app.api.reports.get_db') as mock_get_db:
-        db_instance = MagicMock()
-        db_instance.get_session.return_value.__enter__.return_value = mock_db_session
-        db_instance.get_session.return_value.__exit__.return_value = None
-        mock_get_db.return_value = db_instance
-        yield mock_get_db, mock_db_session
+def mock_db(fake_session):
+    """Shared fake session, reset so no queued results leak between tests"""
+    fake_session.reset()
+    return fake_session
 
 
 class TestReportsEndpoints:
     """Tests for reports endpoints"""
     
-    def test_milk_summary(self, mock_db):
-        """Test GET /reports/milk/summary/{cow_id} - milk production summary"""
-        mock_get_db, mock_session = mock_db
-        
-        # Mock aggregation result
-        mock_result = (
-            500.0,  # total_liters
-            50,     # total_measurements
-            10.0,   # avg_per_measurement
-            datetime(2023, 1, 1, 10, 0, 0),  # first_measurement
-            datetime(2023, 12, 31, 18, 0, 0)  # last_measurement
+    @pytest.mark.parametrize("row, expected", [
+        (
+            SimpleNamespace(
+                total_liters=500.0,
+                total_measurements=50,
+                avg_per_measurement=10.0,
+                first_measurement=FIRST_MEASUREMENT,
+                last_measurement=LAST_MEASUREMENT
+            ),
+            {
+                "total_liters": 500.0,
+                "total_measurements": 50,
+                "avg_per_measurement": 10.0,
+                "first_measurement": "2023-01-01T10:00:00",
+                "last_measurement": "2023-12-31T18:00:00"
+            }
+        ),
+        (
+            # Sums and averages are COALESCEd to 0 in SQL
+            SimpleNamespace(
+                total_liters=0,
+                total_measurements=0,
+                avg_per_measurement=0,
+                first_measurement=None,
+                last_measurement=None
+            ),
+            {
+                "total_liters": 0,
+                "total_measurements": 0,
+                "avg_per_measurement": 0,
+                "first_measurement": None,
+                "last_measurement": None
+            }
         )
-        mock_session.exec.return_value.first.return_value = mock_result
+    ], ids=["with_data", "no_data"])
+    def test_milk_summary(self, client, mock_db, row, expected):
+        """Test GET /reports/milk/summary/{cow_id} - milk production summary"""
+        mock_db.reset([FakeResult(one=row)])
         
         response = client.get("/api/v1/reports/milk/summary/cow-1")
         
         assert response.status_code == 200
-        data = response.json()
-        assert data["total_liters"] == 500.0
-        assert data["total_measurements"] == 50
-        assert data["avg_per_measurement"] == 10.0
-        assert data["first_measurement"] is not None
-        assert data["last_measurement"] is not None
+        assert response.json() == expected
     
-    def test_milk_summary_no_data(self, mock_db):
-        """Test GET /reports/milk/summary/{cow_id} - no data"""
-        mock_get_db, mock_session = mock_db
+    def test_milk_summary_cached(self, client, mock_db):
+        """Test GET /reports/milk/summary/{cow_id} - repeated requests hit the cache"""
+        mock_session = mock_db
         
-        mock_session.exec.return_value.first.return_value = (None, None, None, None, None)
+        mock_session.reset([FakeResult(one=SimpleNamespace(
+            total_liters=500.0,
+            total_measurements=50,
+            avg_per_measurement=10.0,
+            first_measurement=FIRST_MEASUREMENT,
+            last_measurement=LAST_MEASUREMENT
+        ))])
         
-        response = client.get("/api/v1/reports/milk/summary/cow-1")
+        first = client.get("/api/v1/reports/milk/summary/cow-1")
+        second = client.get("/api/v1/reports/milk/summary/cow-1")
         
-        assert response.status_code == 200
-        data = response.json()
-        assert data["total_liters"] == 0
-        assert data["total_measurements"] == 0
-        assert data["avg_per_measurement"] == 0
+        assert first.status_code == second.status_code == 200
+        assert first.json() == second.json()
+        assert mock_session.exec_count == 1
     
-    def test_daily_milk_report(self, mock_db):
+    def test_daily_milk_report(self, client, mock_db):
         """Test GET /reports/milk/daily/{cow_id}/{date} - daily report"""
-        mock_get_db, mock_session = mock_db
+        mock_session = mock_db
         
-        # Mock measurements for a day
+        # Mock detail rows for a day (only the selected columns)
         mock_measurements = [
-            Measurement(
-                id=1,
+            SimpleNamespace(
                 cow_id="cow-1",
-                sensor_id="sensor-1",
-                timestamp=1234567890.0,
-                measured_at=datetime(2023, 6, 15, 10, 0, 0),
+                cow_name="Bessie",
                 value=12.5,
-                unit="L",
-                name="Bessie",
-                birthdate="2020-01-01",
-                recorded_at=datetime(2023, 6, 15, 10, 0, 0)
+                measured_at=DT_AM,
+                sensor_id="sensor-1"
             ),
-            Measurement(
-                id=2,
+            SimpleNamespace(
                 cow_id="cow-1",
-                sensor_id="sensor-1",
-                timestamp=1234567900.0,
-                measured_at=datetime(2023, 6, 15, 16, 0, 0),
+                cow_name="Bessie",
                 value=13.0,
-                unit="L",
-                name="Bessie",
-                birthdate="2020-01-01",
-                recorded_at=datetime(2023, 6, 15, 16, 0, 0)
+                measured_at=DT_PM,
+                sensor_id="sensor-1"
             )
         ]
-        mock_session.exec.return_value.all.return_value = mock_measurements
+        mock_session.reset([
+            FakeResult(one=SimpleNamespace(total_liters=25.5, measurement_count=2)),
+            FakeResult(all_=mock_measurements)
+        ])
         
         response = client.get("/api/v1/reports/milk/daily/cow-1/2023-06-15")
         
@@ -108,92 +193,108 @@ class TestReportsEndpoints:
         assert data["total_liters"] == 25.5
         assert data["measurement_count"] == 2
         assert len(data["measurements"]) == 2
+        assert data["measurements"][0]["cow_name"] == "Bessie"
     
-    def test_daily_milk_report_not_found(self, mock_db):
-        """Test GET /reports/milk/daily/{cow_id}/{date} - no data"""
-        mock_get_db, mock_session = mock_db
+    def test_daily_milk_report_streamed(self, client, mock_db, monkeypatch):
+        """Test GET /reports/milk/daily/{cow_id}/{date} - large reports are streamed"""
+        mock_session = mock_db
+        monkeypatch.setattr('app.api.reports.settings.DAILY_REPORT_STREAM_THRESHOLD', 2)
         
-        mock_session.exec.return_value.all.return_value = []
+        rows = [
+            SimpleNamespace(
+                cow_id="cow-1",
+                cow_name="Bessie",
+                value=float(hour),
+                measured_at=datetime(2023, 6, 15, hour, 0, 0),
+                sensor_id="sensor-1"
+            )
+            for hour in range(3)
+        ]
+        # Rows arrive from the cursor in chunks
+        mock_session.reset([
+            FakeResult(one=SimpleNamespace(total_liters=3.0, measurement_count=3)),
+            FakeResult(partitions=[rows[:2], rows[2:]])
+        ])
         
         response = client.get("/api/v1/reports/milk/daily/cow-1/2023-06-15")
         
-        assert response.status_code == 404
-        assert "No milk measurements found" in response.json()["detail"]
+        assert response.status_code == 200
+        assert response.headers["x-measurement-count"] == "3"
+        assert response.headers["x-total-liters"] == "3.0"
+        data = response.json()
+        assert data["date"] == "2023-06-15"
+        assert data["total_liters"] == 3.0
+        assert data["measurement_count"] == 3
+        assert [m["value"] for m in data["measurements"]] == [0.0, 1.0, 2.0]
     
-    def test_weight_report(self, mock_db):
-        """Test GET /reports/weight/{cow_id} - weight report"""
-        mock_get_db, mock_session = mock_db
-        
-        # Mock current weight measurement
-        mock_current = Measurement(
-            id=1,
-            cow_id="cow-1",
-            sensor_id="sensor-2",
-            timestamp=1234567890.0,
-            measured_at=datetime.now(),
-            value=520.5,
-            unit="kg",
-            name="Bessie",
-            birthdate="2020-01-01",
-            recorded_at=datetime.now()
-        )
+    @pytest.mark.parametrize("days_ago, expected_ttl", [
+        (1, settings.REPORT_CACHE_HISTORICAL_TTL),
+        (0, settings.REPORT_CACHE_TTL)
+    ], ids=["past_day", "today"])
+    def test_daily_milk_report_cache_ttl(self, client, mock_db, monkeypatch, days_ago, expected_ttl):
+        """Test GET /reports/milk/daily/{cow_id}/{date} - closed days are cached longer than today"""
+        report_date = date.today() - timedelta(days=days_ago)
+        ttls = []
+        cache_set = report_cache.set
         
-        # Mock average calculation
-        mock_avg_result = (515.0, 10)  # avg_weight, count
+        def recording_set(key, value, ttl):
+            ttls.append(ttl)
+            cache_set(key, value, ttl)
         
-        # Configure mock to return different values for different queries
-        mock_exec = mock_session.exec
-        mock_exec.return_value.first.side_effect = [mock_current, mock_avg_result]
+        monkeypatch.setattr(report_cache, "set", recording_set)
+        mock_db.reset([
+            FakeResult(one=SimpleNamespace(total_liters=12.5, measurement_count=1)),
+            FakeResult(all_=[SimpleNamespace(
+                cow_id="cow-1", cow_name="Bessie", value=12.5, measured_at=DT_AM, sensor_id="sensor-1"
+            )])
+        ])
         
-        response = client.get("/api/v1/reports/weight/cow-1")
+        response = client.get(f"/api/v1/reports/milk/daily/cow-1/{report_date}")
         
         assert response.status_code == 200
-        data = response.json()
-        assert data["cow_id"] == "cow-1"
-        assert data["cow_name"] == "Bessie"
-        assert data["current_weight"] == 520.5
-        assert data["avg_weight_30_days"] == 515.0
-        assert data["measurements_30_days"] == 10
+        assert ttls == [expected_ttl]
     
-    def test_weight_report_no_data(self, mock_db):
-        """Test GET /reports/weight/{cow_id} - no weight data"""
-        mock_get_db, mock_session = mock_db
+    def test_daily_milk_report_not_found(self, client, mock_db):
+        """Test GET /reports/milk/daily/{cow_id}/{date} - no data"""
+        mock_session = mock_db
         
-        mock_session.exec.return_value.first.return_value = None
+        mock_session.reset([FakeResult(one=SimpleNamespace(total_liters=0, measurement_count=0))])
         
-        response = client.get("/api/v1/reports/weight/cow-1")
+        response = client.get("/api/v1/reports/milk/daily/cow-1/2023-06-15")
         
         assert response.status_code == 404
-        assert "No weight measurements found" in response.json()["detail"]
+        assert "No milk measurements found" in response.json()["detail"]
     
-    def test_weight_report_no_avg_data(self, mock_db):
-        """Test GET /reports/weight/{cow_id} - current weight but no 30-day avg"""
-        mock_get_db, mock_session = mock_db
-        
-        # Mock current weight measurement
-        mock_current = Measurement(
-            id=1,
-            cow_id="cow-1",
-            sensor_id="sensor-2",
-            timestamp=1234567890.0,
-            measured_at=datetime.now(),
-            value=520.5,
-            unit="kg",
-            name="Bessie",
-            birthdate="2020-01-01",
-            recorded_at=datetime.now()
+    @pytest.mark.parametrize("row, expected_status, expected", [
+        (
+            weight_row(avg_weight=515.0, measurements_30_days=10),
+            200,
+            {
+                "cow_id": "cow-1",
+                "cow_name": "Bessie",
+                "current_weight": 520.5,
+                "avg_weight_30_days": 515.0,
+                "measurements_30_days": 10
+            }
+        ),
+        (
+            # Current weight but no 30-day average
+            weight_row(avg_weight=None, measurements_30_days=0),
+            200,
+            {"current_weight": 520.5, "avg_weight_30_days": None, "measurements_30_days": 0}
+        ),
+        (
+            None,
+            404,
+            {"detail": "No weight measurements found for cow cow-1"}
         )
-        
-        # No average data
-        mock_avg_result = (None, 0)
-        
-        mock_exec = mock_session.exec
-        mock_exec.return_value.first.side_effect = [mock_current, mock_avg_result]
+    ], ids=["with_average", "no_average", "no_data"])
+    def test_weight_report(self, client, mock_db, row, expected_status, expected):
+        """Test GET /reports/weight/{cow_id} - weight report"""
+        mock_db.reset([FakeResult(first=row)])
         
         response = client.get("/api/v1/reports/weight/cow-1")
         
-        assert response.status_code == 200
+        assert response.status_code == expected_status
         data = response.json()
-        assert data["current_weight"] == 520.5
-        assert data["avg_weight_30_days"] is None
-        assert data["measurements_30_days"] == 0
+        assert {key: data[key] for key in expected} == expected
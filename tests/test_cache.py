@@ -0,0 +1,77 @@
+import pytest
+from types import SimpleNamespace
+from app.core.cache import TTLCache
+
+
+class FakeClock:
+    """Stand-in for time.monotonic that only moves when advanced"""
+    
+    def __init__(self):
+        self.now = 1000.0
+    
+    def monotonic(self):
+        return self.now
+    
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake clock patched into the cache module"""
+    fake_clock = FakeClock()
+    monkeypatch.setattr('app.core.cache.time', SimpleNamespace(monotonic=fake_clock.monotonic))
+    return fake_clock
+
+
+def test_set_and_get(clock):
+    """Test that a cached value is returned and a missing key gives None"""
+    cache = TTLCache()
+    cache.set("key", "value", ttl=10)
+    
+    assert cache.get("key") == "value"
+    assert cache.get("missing") is None
+
+
+def test_entry_expires_after_ttl(clock):
+    """Test that entries are dropped once their TTL has passed"""
+    cache = TTLCache()
+    cache.set("short", 1, ttl=10)
+    cache.set("long", 2, ttl=60)
+    
+    clock.advance(9.9)
+    assert cache.get("short") == 1
+    
+    clock.advance(0.1)
+    assert cache.get("short") is None
+    assert cache.get("long") == 2
+    
+    clock.advance(50)
+    assert cache.get("long") is None
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    """Test that the least recently used entry is evicted when the cache is full"""
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1, ttl=60)
+    cache.set("b", 2, ttl=60)
+    
+    # Reading "a" makes "b" the least recently used
+    assert cache.get("a") == 1
+    cache.set("c", 3, ttl=60)
+    
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_clear(clock):
+    """Test that clear removes every entry"""
+    cache = TTLCache()
+    cache.set("a", 1, ttl=60)
+    cache.set("b", 2, ttl=60)
+    
+    cache.clear()
+    
+    assert cache.get("a") is None
+    assert cache.get("b") is None
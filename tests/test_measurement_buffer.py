@@ -0,0 +1,85 @@
+import asyncio
+import pytest
+from unittest.mock import Mock
+from datetime import datetime
+from app.schemas.measurement import MeasurementResponse
+from app.services.measurement_buffer import MeasurementBuffer
+
+
+def make_measurement(value: float) -> MeasurementResponse:
+    return MeasurementResponse(
+        cow_id="cow-1",
+        sensor_id="sensor-1",
+        timestamp=1234567890.0,
+        measured_at=datetime(2023, 1, 1, 10, 0, 0),
+        value=value,
+        unit="L"
+    )
+
+
+@pytest.fixture
+def mock_db():
+    """Mock database"""
+    db = Mock()
+    db.save_measurements = Mock()
+    return db
+
+
+def test_put_without_start_writes_immediately(mock_db):
+    """Test that a buffer that isn't running writes each measurement directly"""
+    buffer = MeasurementBuffer(mock_db)
+    measurement = make_measurement(1.0)
+    
+    asyncio.run(buffer.put(measurement))
+    
+    mock_db.save_measurements.assert_called_once_with([measurement])
+
+
+def test_measurements_written_in_one_batch(mock_db):
+    """Test that measurements queued together are saved with a single write"""
+    buffer = MeasurementBuffer(mock_db, max_batch_size=128, flush_interval=0.05)
+    measurements = [make_measurement(float(i)) for i in range(5)]
+    
+    async def run():
+        buffer.start()
+        for m in measurements:
+            await buffer.put(m)
+        await asyncio.sleep(0.2)
+        await buffer.stop()
+    
+    asyncio.run(run())
+    
+    mock_db.save_measurements.assert_called_once_with(measurements)
+
+
+def test_batches_capped_at_max_size(mock_db):
+    """Test that a full batch is flushed without waiting for the interval"""
+    buffer = MeasurementBuffer(mock_db, max_batch_size=2, flush_interval=10)
+    measurements = [make_measurement(float(i)) for i in range(5)]
+    
+    async def run():
+        buffer.start()
+        for m in measurements:
+            await buffer.put(m)
+        await buffer.stop()
+    
+    asyncio.run(run())
+    
+    batches = [call.args[0] for call in mock_db.save_measurements.call_args_list]
+    assert [len(b) for b in batches] == [2, 2, 1]
+    assert [m for b in batches for m in b] == measurements
+
+
+def test_stop_flushes_pending_measurements(mock_db):
+    """Test that stopping the buffer writes measurements still queued"""
+    buffer = MeasurementBuffer(mock_db, flush_interval=10)
+    measurement = make_measurement(1.0)
+    
+    async def run():
+        buffer.start()
+        await buffer.put(measurement)
+        await buffer.stop()
+    
+    asyncio.run(run())
+    
+    mock_db.save_measurements.assert_called_once_with([measurement])
@@ -1,17 +1,18 @@
 import pytest
 import polars as pl
+import numpy as np
+from datetime import date
 from pathlib import Path
 import sys
-import tempfile
-import os
+from unittest.mock import patch
 
 # Add parent directory to path to import the module
 sys.path.insert(0, str(Path(__file__).parent.parent))
-from simulators.read_measurements import MeasurementReader
+from simulators.read_measurements import MeasurementReader, _load_records_by_cow, get_measurement_reader
 
-@pytest.fixture
-def sample_parquet_files():
-    """Create temporary measurement and sensor parquet files for testing joins"""
+@pytest.fixture(scope="session")
+def sample_parquet_files(tmp_path_factory):
+    """Create temporary measurement and sensor parquet files for testing joins, once per session"""
     # Create measurements data
     measurements_data = {
         'cow_id': ['cow-1', 'cow-2', 'cow-1', 'cow-2', 'cow-1'],
@@ -19,57 +20,143 @@ def sample_parquet_files():
         'timestamp': [1704067200.0, 1704070800.0, 1704074400.0, 1704078000.0, 1704081600.0],
         'value': [10.5, None, None, 15.2, 600.8]
     }
-    measurements_df = pl.DataFrame(measurements_data)
+    measurements_df = pl.DataFrame(measurements_data, schema={
+        'cow_id': pl.Utf8, 'sensor_id': pl.Utf8,
+        'timestamp': pl.Float64, 'value': pl.Float64,
+    })
     
     # Create sensors data
     sensors_data = {
         'id': ['sensor-1', 'sensor-2', 'sensor-3'],
         'unit': ['L', 'L', 'Kg']
     }
-    sensors_df = pl.DataFrame(sensors_data)
+    sensors_df = pl.DataFrame(sensors_data, schema={'id': pl.Utf8, 'unit': pl.Utf8})
     
     # Create cows data
     cows_data = {
         'id': ['cow-1', 'cow-2'],
         'name': ['Bessie', 'Daisy'],
-        'birthdate': ['2020-01-15', '2021-03-20']
+        'birthdate': [date(2020, 1, 15), date(2021, 3, 20)]
     }
-    cows_df = pl.DataFrame(cows_data)
-    
-    # Create temporary files
-    measurements_file = tempfile.NamedTemporaryFile(mode='wb', delete=False, suffix='_measurements.parquet')
-    measurements_df.write_parquet(measurements_file.name)
-    measurements_file.close()
-    
-    sensors_file = tempfile.NamedTemporaryFile(mode='wb', delete=False, suffix='_sensors.parquet')
-    sensors_df.write_parquet(sensors_file.name)
-    sensors_file.close()
-    
-    cows_file = tempfile.NamedTemporaryFile(mode='wb', delete=False, suffix='_cows.parquet')
-    cows_df.write_parquet(cows_file.name)
-    cows_file.close()
-    
-    yield measurements_file.name, sensors_file.name, cows_file.name
-    
-    # Cleanup
-    os.unlink(measurements_file.name)
-    os.unlink(sensors_file.name)
-    os.unlink(cows_file.name)
+    cows_df = pl.DataFrame(cows_data, schema={'id': pl.Utf8, 'name': pl.Utf8, 'birthdate': pl.Date})
+    
+    # Write the files to a temporary directory, pytest removes it
+    tmp_dir = tmp_path_factory.mktemp("measurements")
+    measurements_file = tmp_dir / "measurements.parquet"
+    sensors_file = tmp_dir / "sensors.parquet"
+    cows_file = tmp_dir / "cows.parquet"
+    # Tiny files read straight back: skip compression and column statistics
+    write_options = {'compression': 'uncompressed', 'statistics': False}
+    measurements_df.write_parquet(measurements_file, **write_options)
+    sensors_df.write_parquet(sensors_file, **write_options)
+    cows_df.write_parquet(cows_file, **write_options)
+    
+    return str(measurements_file), str(sensors_file), str(cows_file)
 
 
-def test_initialization(sample_parquet_files):
-    """Test that the reader initializes correctly"""
+@pytest.fixture
+def reader(sample_parquet_files):
+    """Fresh reader over the shared parquet files, since tests advance its indices"""
     measurements_file, sensors_file, cows_file = sample_parquet_files
-    reader = MeasurementReader(measurements_file, sensors_file, cows_file)
-    assert reader.df.height == 5
+    return MeasurementReader(measurements_file, sensors_file, cows_file)
+
+
+def test_initialization(reader):
+    """Test that the reader initializes correctly"""
+    assert sum(records.height for records in reader.records_by_cow.values()) == 5
+    assert set(reader.records_by_cow) == {'cow-1', 'cow-2'}
     assert reader.indices == {}
     assert reader.cow_records == {}
 
 
-def test_consecutive_measurements(sample_parquet_files):
-    """Test that consecutive calls return consecutive measurements"""
+def test_partitions_are_joined_at_init(reader):
+    """Test that sensor units and cow info are joined into the per-cow partitions on load"""
+    cow_1 = reader.records_by_cow['cow-1']
+    
+    assert cow_1['sensor_id'].to_list() == ['sensor-1', 'sensor-1', 'sensor-3']
+    assert cow_1['unit'].to_list() == ['L', 'L', 'Kg']
+    assert cow_1['name'].to_list() == ['Bessie'] * 3
+
+
+def test_ipc_staging(sample_parquet_files):
+    """Test that staged Arrow IPC files are written once and read back identically"""
     measurements_file, sensors_file, cows_file = sample_parquet_files
-    reader = MeasurementReader(measurements_file, sensors_file, cows_file)
+    ipc_files = [Path(f).with_suffix('.arrow') for f in sample_parquet_files]
+    try:
+        # Clear the shared load cache so each reader actually reads the files
+        _load_records_by_cow.cache_clear()
+        staged = MeasurementReader(measurements_file, sensors_file, cows_file, stage_ipc=True)
+        assert all(f.exists() for f in ipc_files)
+        
+        # A second reader uses the staged files
+        staged_times = [f.stat().st_mtime_ns for f in ipc_files]
+        _load_records_by_cow.cache_clear()
+        restaged = MeasurementReader(measurements_file, sensors_file, cows_file, stage_ipc=True)
+        assert [f.stat().st_mtime_ns for f in ipc_files] == staged_times
+        assert _load_records_by_cow.cache_info().misses == 1
+        plain = MeasurementReader(measurements_file, sensors_file, cows_file)
+        
+        fields = ['sensor_id', 'value', 'unit', 'name', 'birthdate']
+        expected = [[getattr(m, f) for f in fields] for m in plain.get_next_n_measurements('cow-1', 4)]
+        for reader in (staged, restaged):
+            assert [[getattr(m, f) for f in fields] for m in reader.get_next_n_measurements('cow-1', 4)] == expected
+    finally:
+        for f in ipc_files:
+            f.unlink(missing_ok=True)
+
+
+def test_readers_share_loaded_records(sample_parquet_files, reader):
+    """Test that readers over the same files reuse one load but keep their own indices"""
+    other = MeasurementReader(*sample_parquet_files)
+    
+    assert other.records_by_cow['cow-1'] is reader.records_by_cow['cow-1']
+    reader.get_next_measurement('cow-1')
+    other.get_next_n_measurements('cow-1', 2)
+    assert reader.indices == {'cow-1': 1}
+    assert other.indices == {'cow-1': 2}
+
+
+def test_ipc_staging_recovers_from_truncated_file(sample_parquet_files):
+    """Test that a truncated staged file is written again instead of failing later reads"""
+    measurements_file, sensors_file, cows_file = sample_parquet_files
+    ipc_files = [Path(f).with_suffix('.arrow') for f in sample_parquet_files]
+    plain = MeasurementReader(measurements_file, sensors_file, cows_file)
+    try:
+        _load_records_by_cow.cache_clear()
+        MeasurementReader(measurements_file, sensors_file, cows_file, stage_ipc=True)
+        # Cut the file as a crash mid-write would, keeping it newer than the parquet file
+        staged_bytes = ipc_files[0].read_bytes()
+        ipc_files[0].write_bytes(staged_bytes[:len(staged_bytes) // 2])
+        
+        _load_records_by_cow.cache_clear()
+        restaged = MeasurementReader(measurements_file, sensors_file, cows_file, stage_ipc=True)
+        
+        fields = ['sensor_id', 'value', 'unit', 'name', 'birthdate']
+        expected = [[getattr(m, f) for f in fields] for m in plain.get_next_n_measurements('cow-1', 3)]
+        assert [[getattr(m, f) for f in fields] for m in restaged.get_next_n_measurements('cow-1', 3)] == expected
+        assert ipc_files[0].read_bytes() == staged_bytes
+        assert list(ipc_files[0].parent.glob('*.tmp')) == []
+    finally:
+        for f in ipc_files:
+            f.unlink(missing_ok=True)
+
+
+def test_get_measurement_reader_is_shared():
+    """Test that the reader factory loads the parquet files once per process"""
+    get_measurement_reader.cache_clear()
+    try:
+        with patch('simulators.read_measurements.MeasurementReader') as mock_reader_class:
+            first = get_measurement_reader()
+            second = get_measurement_reader()
+        
+        assert first is second
+        mock_reader_class.assert_called_once_with(stage_ipc=False)
+    finally:
+        get_measurement_reader.cache_clear()
+
+
+def test_consecutive_measurements(reader):
+    """Test that consecutive calls return consecutive measurements"""
     
     # Get three consecutive measurements for cow-1
     m1 = reader.get_next_measurement('cow-1')
@@ -88,10 +175,8 @@ def test_consecutive_measurements(sample_parquet_files):
     assert reader.indices['cow-1'] == 0
 
 
-def test_cycling_at_end_of_records(sample_parquet_files):
+def test_cycling_at_end_of_records(reader):
     """Test that the reader cycles back to the beginning when reaching the end"""
-    measurements_file, sensors_file, cows_file = sample_parquet_files
-    reader = MeasurementReader(measurements_file, sensors_file, cows_file)
     
     # cow-1 has 3 measurements, get 4 to test cycling
     m1 = reader.get_next_measurement('cow-1')
@@ -114,10 +199,8 @@ def test_cycling_at_end_of_records(sample_parquet_files):
     assert reader.indices['cow-1'] == 1
 
 
-def test_multiple_cows_independent_indices(sample_parquet_files):
+def test_multiple_cows_independent_indices(reader):
     """Test that different cows maintain independent indices"""
-    measurements_file, sensors_file, cows_file = sample_parquet_files
-    reader = MeasurementReader(measurements_file, sensors_file, cows_file)
     
     # Get measurements for two different cows
     cow1_m1 = reader.get_next_measurement('cow-1')
@@ -134,42 +217,74 @@ def test_multiple_cows_independent_indices(sample_parquet_files):
     assert cow1_m2.value == 10.5
 
 
-
-def test_invalid_cow_id(sample_parquet_files):
+def test_invalid_cow_id(reader):
     """Test that requesting invalid cow_id raises error"""
-    measurements_file, sensors_file, cows_file = sample_parquet_files
-    reader = MeasurementReader(measurements_file, sensors_file, cows_file)
     
     with pytest.raises(ValueError, match="No measurements found for cow_id"):
         reader.get_next_measurement('invalid-cow')
 
 
-def test_many_cycles(sample_parquet_files):
+def test_many_cycles(reader):
     """Test that cycling works correctly over many iterations"""
-    measurements_file, sensors_file, cows_file = sample_parquet_files
-    reader = MeasurementReader(measurements_file, sensors_file, cows_file)
     
-    # Get 100 measurements and verify pattern repeats
-    values = []
-    for _ in range(100):
-        m = reader.get_next_measurement('cow-1')
-        values.append(m.value)
+    # Get 100 measurements in one batch and verify pattern repeats
+    values = [m.value for m in reader.get_next_n_measurements('cow-1', 100)]
     
     # Every 3 values should repeat the pattern [10.5, 10.5, 600.8]
     expected_pattern = [10.5, 10.5, 600.8]
-    for i in range(100):
-        assert values[i] == expected_pattern[i % 3]
+    expected = np.tile(expected_pattern, 34)[:100]
+    np.testing.assert_array_equal(np.asarray(values), expected)
     
     # After 99 cycles (99 % 3 = 0), index should be at 1 (100th call moved it)
     assert reader.indices['cow-1'] == 1
 
 
+def test_next_n_measurements_matches_single_calls(sample_parquet_files):
+    """Test that a batch returns the same records as consecutive single calls"""
+    measurements_file, sensors_file, cows_file = sample_parquet_files
+    single_reader = MeasurementReader(measurements_file, sensors_file, cows_file)
+    batch_reader = MeasurementReader(measurements_file, sensors_file, cows_file)
+    
+    singles = [single_reader.get_next_measurement('cow-2') for _ in range(5)]
+    batch = batch_reader.get_next_n_measurements('cow-2', 5)
+    
+    fields = ['sensor_id', 'value', 'unit', 'name', 'birthdate']
+    assert [[getattr(m, f) for f in fields] for m in batch] == [[getattr(m, f) for f in fields] for m in singles]
+    assert batch_reader.indices['cow-2'] == single_reader.indices['cow-2'] == 1
+    
+    # Single calls continue from where the batch stopped
+    assert batch_reader.get_next_measurement('cow-2').value == 15.2
+
+
+def test_indices_are_read_only(reader):
+    """Test that the index snapshot can't be written, indices move through reset_index"""
+    reader.get_next_measurement('cow-1')
+    
+    with pytest.raises(TypeError):
+        reader.indices['cow-1'] = 0
+    
+    reader.reset_index('cow-1')
+    assert reader.indices == {'cow-1': 0}
+
+
+def test_reset_all_indices(reader):
+    """Test that resetting all cows restarts them without reloading their records"""
+    
+    first = reader.get_next_measurement('cow-1')
+    reader.get_next_measurement('cow-2')
+    cached_records = reader.cow_records['cow-1']
+    
+    reader.reset_index()
+    
+    assert reader.indices == {'cow-1': 0, 'cow-2': 0}
+    assert reader.cow_records['cow-1'] is cached_records
+    assert reader.get_next_measurement('cow-1').sensor_id == first.sensor_id
+
+
 # Tests with nulls
 
-def test_null_value_replaced_with_index(sample_parquet_files):
+def test_null_value_replaced_with_index(reader):
     """Test that null values are replaced with the current index"""
-    measurements_file, sensors_file, cows_file = sample_parquet_files
-    reader = MeasurementReader(measurements_file, sensors_file, cows_file)
     
     # Get measurements for cow-1
     m1 = reader.get_next_measurement('cow-1')  # index 0, value 10.5
@@ -188,10 +303,8 @@ def test_null_value_replaced_with_index(sample_parquet_files):
     assert m3.value == 600.8
 
 
-def test_null_value_initial_null(sample_parquet_files):
+def test_null_value_initial_null(reader):
     """Test null value replacement for cow-2"""
-    measurements_file, sensors_file, cows_file = sample_parquet_files
-    reader = MeasurementReader(measurements_file, sensors_file, cows_file)
     
     # Get measurements for cow-2
     m1 = reader.get_next_measurement('cow-2')  # index 0, value is null -> should be 0
@@ -203,11 +316,31 @@ def test_null_value_initial_null(sample_parquet_files):
     assert m2.value == 15.2
 
 
+def test_null_value_before_same_unit_value_after_cycling(tmp_path):
+    """Test that a null before any same-unit value is 0 on every pass, not carried over from the last one"""
+    measurements_file = tmp_path / "measurements.parquet"
+    sensors_file = tmp_path / "sensors.parquet"
+    cows_file = tmp_path / "cows.parquet"
+    pl.DataFrame({
+        'cow_id': ['cow-3', 'cow-3', 'cow-3'],
+        'sensor_id': ['sensor-3', 'sensor-1', 'sensor-1'],
+        'timestamp': [1704067200.0, 1704070800.0, 1704074400.0],
+        'value': [500.0, None, 7.0]
+    }, schema={'cow_id': pl.Utf8, 'sensor_id': pl.Utf8, 'timestamp': pl.Float64, 'value': pl.Float64}).write_parquet(measurements_file)
+    pl.DataFrame({'id': ['sensor-1', 'sensor-3'], 'unit': ['L', 'Kg']}).write_parquet(sensors_file)
+    pl.DataFrame({'id': ['cow-3'], 'name': ['Clover'], 'birthdate': [date(2022, 5, 1)]}).write_parquet(cows_file)
+    reader = MeasurementReader(str(measurements_file), str(sensors_file), str(cows_file))
+    
+    values = [m.value for m in reader.get_next_n_measurements('cow-3', 6)]
+    
+    # Nulls are filled once at load, within the file. The second pass doesn't
+    # take 7.0 from the end of the first pass for the null at index 1.
+    assert values == [500.0, 0.0, 7.0, 500.0, 0.0, 7.0]
+
+
 # Tests for sensor unit join
-def test_sensor_unit_join(sample_parquet_files):
+def test_sensor_unit_join(reader):
     """Test that sensor unit is added to measurement records"""
-    measurements_file, sensors_file, cows_file = sample_parquet_files
-    reader = MeasurementReader(measurements_file, sensors_file, cows_file)
     
     # Get measurements for cow-1
     m1 = reader.get_next_measurement('cow-1')
@@ -225,10 +358,8 @@ def test_sensor_unit_join(sample_parquet_files):
     assert m3.value == 600.8
 
 
-def test_sensor_unit_after_cycling(sample_parquet_files):
+def test_sensor_unit_after_cycling(reader):
     """Test that sensor unit join works correctly after cycling"""
-    measurements_file, sensors_file, cows_file = sample_parquet_files
-    reader = MeasurementReader(measurements_file, sensors_file, cows_file)
     
     # Get 4 measurements (will cycle after 3)
     m1 = reader.get_next_measurement('cow-1')
@@ -240,3 +371,29 @@ def test_sensor_unit_after_cycling(sample_parquet_files):
     assert m4.sensor_id == m1.sensor_id
     assert m4.unit == m1.unit
 
+
+def test_next_measurements_for_many_cows(reader):
+    """Test that the batch call returns one measurement per known cow"""
+    
+    measurements = reader.get_next_measurements(['cow-1', 'invalid-cow', 'cow-2'])
+    
+    # Unknown cows are skipped
+    assert [m.cow_id for m in measurements] == ['cow-1', 'cow-2']
+    assert measurements[0].value == 10.5
+    assert measurements[1].value == 0
+    assert reader.indices == {'cow-1': 1, 'cow-2': 1}
+    
+    # Subsequent single calls continue from the batch position
+    assert reader.get_next_measurement('cow-1').value == 10.5
+
+
+def test_next_measurements_share_one_timestamp(reader):
+    """Test that every record of a batch is stamped with the same time"""
+    
+    measurements = reader.get_next_measurements(['cow-1', 'cow-2', 'cow-1'])
+    
+    assert len({m.measured_at for m in measurements}) == 1
+    assert len({m.timestamp for m in measurements}) == 1
+    # A cow listed twice advances twice
+    assert [m.value for m in measurements] == [10.5, 0, 10.5]
+    assert reader.indices == {'cow-1': 2, 'cow-2': 1}